@@ -24,6 +24,16 @@ def get_algerian_date():
     """Get current date in Algerian timezone"""
     return get_algerian_time().date()
 
+def validate_multi_day_schedule(multi_day_schedule):
+    """Validate a kindergarten multi_day_schedule JSON list of day indices (0-6); raises ValueError"""
+    days_list = json.loads(multi_day_schedule)
+    if not isinstance(days_list, list) or not days_list:
+        raise ValueError("Invalid schedule format")
+    # Validate day indices (0-6) in a single pass
+    if not all(isinstance(day, int) and 0 <= day <= 6 for day in days_list):
+        raise ValueError("Invalid day index")
+    return days_list
+
 # ===== DELETION HELPER FUNCTIONS =====
 
 def safe_delete_with_logging(entity, entity_type, entity_id, user_id, related_deletions=None):
@@ -7348,16 +7358,9 @@ def create_kindergarten_class():
             return jsonify({'error': 'Course must be a kindergarten course'}), 400
 
         # Validate multi_day_schedule JSON
-        import json
         try:
-            days_list = json.loads(multi_day_schedule)
-            if not isinstance(days_list, list) or not days_list:
-                raise ValueError("Invalid schedule format")
-            # Validate day indices (0-6)
-            for day in days_list:
-                if not isinstance(day, int) or day < 0 or day > 6:
-                    raise ValueError("Invalid day index")
-        except (json.JSONDecodeError, ValueError) as e:
+            validate_multi_day_schedule(multi_day_schedule)
+        except ValueError as e:
             return jsonify({'error': f'Invalid multi_day_schedule format: {str(e)}'}), 400
 
         # Parse times
@@ -7470,17 +7473,10 @@ def update_kindergarten_class(class_id):
         if 'multi_day_schedule' in request.form:
             multi_day_schedule = request.form['multi_day_schedule']
             # Validate multi_day_schedule JSON
-            import json
             try:
-                days_list = json.loads(multi_day_schedule)
-                if not isinstance(days_list, list) or not days_list:
-                    raise ValueError("Invalid schedule format")
-                # Validate day indices (0-6)
-                for day in days_list:
-                    if not isinstance(day, int) or day < 0 or day > 6:
-                        raise ValueError("Invalid day index")
+                validate_multi_day_schedule(multi_day_schedule)
                 kindergarten_class.multi_day_schedule = multi_day_schedule
-            except (json.JSONDecodeError, ValueError) as e:
+            except ValueError as e:
                 return jsonify({'error': f'Invalid multi_day_schedule format: {str(e)}'}), 400
         
         if 'start_time' in request.form:
@@ -7561,17 +7557,21 @@ def activate_kindergarten_subscription(enrollment_id):
         if course:
             enrollment.subscription_amount = course.monthly_price or course.price
 
+        # Build the response before committing; the commit expires the enrollment
+        # and reading it afterwards would reload the row
+        enrollment_data = {
+            'id': enrollment.id,
+            'subscription_start_date': enrollment.subscription_start_date.isoformat(),
+            'next_subscription_date': enrollment.next_subscription_date.isoformat(),
+            'subscription_status': enrollment.subscription_status,
+            'subscription_amount': float(enrollment.subscription_amount) if enrollment.subscription_amount else None
+        }
+
         db.session.commit()
 
         return jsonify({
             'message': 'Kindergarten subscription activated successfully',
-            'enrollment': {
-                'id': enrollment.id,
-                'subscription_start_date': enrollment.subscription_start_date.isoformat(),
-                'next_subscription_date': enrollment.next_subscription_date.isoformat(),
-                'subscription_status': enrollment.subscription_status,
-                'subscription_amount': float(enrollment.subscription_amount) if enrollment.subscription_amount else None
-            }
+            'enrollment': enrollment_data
         }), 200
 
     except Exception as e:
@@ -7610,15 +7610,18 @@ def renew_kindergarten_subscription(enrollment_id):
         enrollment.next_subscription_date = date(next_year, next_month, current_next_date.day)
         enrollment.subscription_status = 'active'
 
+        # Build the response before committing (see activate_kindergarten_subscription)
+        enrollment_data = {
+            'id': enrollment.id,
+            'next_subscription_date': enrollment.next_subscription_date.isoformat(),
+            'subscription_status': enrollment.subscription_status
+        }
+
         db.session.commit()
 
         return jsonify({
             'message': 'Kindergarten subscription renewed successfully',
-            'enrollment': {
-                'id': enrollment.id,
-                'next_subscription_date': enrollment.next_subscription_date.isoformat(),
-                'subscription_status': enrollment.subscription_status
-            }
+            'enrollment': enrollment_data
         }), 200
 
     except Exception as e:
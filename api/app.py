@@ -6,6 +6,11 @@ from flask import Flask, request, jsonify, g
 from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
 from flask_mail import Mail
 from flask_cors import CORS
+
+try:
+    from flask_compress import Compress
+except ImportError:
+    Compress = None  # Responses are sent uncompressed without Flask-Compress
 # from werkzeug.middleware.proxy_fix import ProxyFix  # Commented out for Vercel compatibility
 
 # Import models and database
@@ -93,6 +98,11 @@ class Config:
     # Rate Limiting
     RATELIMIT_STORAGE_URI = os.environ.get('REDIS_URL') or 'memory://'
 
+    # Response compression (Flask-Compress) for the large JSON listings
+    COMPRESS_MIMETYPES = ['application/json']
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIN_SIZE = 1024
+
     # File Upload
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
 
@@ -221,6 +231,10 @@ def create_app(config_class=Config):
         # Attach mail to app instance for use in utils
         app.mail = mail
 
+        # Gzip/brotli JSON responses for clients that send Accept-Encoding
+        if Compress is not None:
+            Compress(app)
+
         # Register JWT error handlers
         register_jwt_error_handlers(jwt)
 
@@ -2,15 +2,84 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+from sqlalchemy.orm import joinedload
+import hashlib
 import secrets
+import traceback
 
 auth_bp = Blueprint('auth', __name__)
 
 # Import models and utilities
 from models import db, User, Parent, Student, Enrollment, SectionEnrollment, validate_phone, validate_email
-from utils import send_verification_email, hash_password, verify_password, generate_verification_token, generate_parent_mobile_credentials, generate_student_mobile_credentials
+from utils import json_response, send_verification_email, hash_password, verify_password, generate_verification_token, generate_parent_mobile_credentials, generate_student_mobile_credentials
 from imgbb_uploader import upload_profile_picture
 
+# Profile completion checks: (attribute, missing-field label) per record
+PROFILE_USER_FIELDS = (
+    ('full_name', 'user_full_name'),
+    ('email', 'user_email'),
+    ('phone', 'user_phone'),
+    ('gender', 'user_gender'),
+)
+PROFILE_PARENT_FIELDS = (
+    ('full_name', 'parent_full_name'),
+    ('phone', 'parent_phone'),
+    ('email', 'parent_email'),
+)
+PROFILE_STUDENT_FIELDS = (
+    ('name', 'student_name'),
+    ('date_of_birth', 'student_date_of_birth'),
+)
+# Not required once the profile has been submitted through /profile/complete
+PROFILE_OPTIONAL_FIELDS = frozenset(('user_email', 'parent_email'))
+
+# Profile fields copied (stripped) from /profile/complete: (request key, attribute)
+PROFILE_USER_UPDATES = (
+    ('user_full_name', 'full_name'),
+    ('user_phone', 'phone'),
+)
+PROFILE_PARENT_UPDATES = (
+    ('parent_full_name', 'full_name'),
+    ('parent_phone', 'phone'),
+    ('parent_email', 'email'),
+)
+PROFILE_STUDENT_UPDATES = (
+    ('user_full_name', 'name'),  # Student name should match user full_name
+)
+# Request keys validated as phone numbers before being stored
+PROFILE_PHONE_ERRORS = {
+    'user_phone': 'Invalid phone number format',
+    'parent_phone': 'Invalid parent phone number format',
+}
+
+def apply_profile_updates(record, data, fields):
+    """Copy the non-empty submitted fields (already stripped) onto a record; returns an error message or None"""
+    for key, attr in fields:
+        value = data.get(key)
+        if value:
+            if key in PROFILE_PHONE_ERRORS and not validate_phone(value):
+                return PROFILE_PHONE_ERRORS[key]
+            setattr(record, attr, value)
+    return None
+
+def missing_profile_fields(user, parent, student, strict=True):
+    """
+    Labels of the profile fields still missing for a user.
+
+    strict (the completion check) requires every field and counts a missing
+    parent/student record as all of its fields missing; otherwise emails are
+    optional and only existing records are checked.
+    """
+    missing_fields = [label for attr, label in PROFILE_USER_FIELDS if not getattr(user, attr)]
+    for record, fields in ((parent, PROFILE_PARENT_FIELDS), (student, PROFILE_STUDENT_FIELDS)):
+        if record:
+            missing_fields.extend(label for attr, label in fields if not getattr(record, attr))
+        elif strict:
+            missing_fields.extend(label for _, label in fields)
+    if not strict:
+        missing_fields = [label for label in missing_fields if label not in PROFILE_OPTIONAL_FIELDS]
+    return missing_fields
+
 def auto_generate_mobile_credentials_if_eligible(student_id):
     """
     Automatically generate mobile credentials for student and parent if conditions are met:
@@ -86,7 +155,6 @@ def auto_generate_mobile_credentials_if_eligible(student_id):
     except Exception as e:
         db.session.rollback()
         print(f"❌ [AUTO_GEN] Error generating credentials: {str(e)}")
-        import traceback
         traceback.print_exc()
         return {'generated': False, 'reason': f'Error: {str(e)}'}
 
@@ -311,7 +379,7 @@ def login():
     print("Login successful")
     # Skip email verification check since it's no longer required
     # Create access token
-    access_token = create_access_token(identity=str(user.id))
+    access_token = create_access_token(identity=str(user.id), additional_claims={'role': user.role})
 
     # Get parent and students data for client users
     parent = None
@@ -838,7 +906,6 @@ def generate_mobile_credentials_for_user():
 
     except Exception as e:
         print(f"❌ [GENERATE_CREDENTIALS] Error: {str(e)}")
-        import traceback
         traceback.print_exc()
         db.session.rollback()
         return jsonify({'error': f'Failed to generate credentials: {str(e)}'}), 500
@@ -1040,7 +1107,7 @@ def barcode_setup_login():
         print(f"✅ [BARCODE_SETUP] Setup completed successfully for user {user.id}, phone: {phone}")
 
         # Create access token
-        access_token = create_access_token(identity=str(user.id))
+        access_token = create_access_token(identity=str(user.id), additional_claims={'role': user.role})
 
         # Prepare response
         students_data = [{
@@ -1080,7 +1147,6 @@ def barcode_setup_login():
     except Exception as e:
         db.session.rollback()
         print(f"❌ [BARCODE_SETUP] Error: {str(e)}")
-        import traceback
         traceback.print_exc()
         return jsonify({'error': 'Failed to complete setup'}), 500
 
@@ -1239,12 +1305,11 @@ def barcode_login():
     except Exception as e:
         db.session.rollback()
         print(f"❌ [BARCODE_LOGIN] Error during barcode login: {str(e)}")
-        import traceback
         traceback.print_exc()
         return jsonify({'error': f'Login failed: {str(e)}'}), 500
 
     # Create access token
-    access_token = create_access_token(identity=str(user.id))
+    access_token = create_access_token(identity=str(user.id), additional_claims={'role': user.role})
 
     # Return user data and token (with profile_incomplete flag)
     # Check essential fields: phone, full_name, parent name/phone, student birth_date (email is optional)
@@ -1423,7 +1488,6 @@ def complete_parent_info():
     except Exception as e:
         db.session.rollback()
         print(f"❌ [COMPLETE_PARENT_INFO] Error: {str(e)}")
-        import traceback
         traceback.print_exc()
         return jsonify({'error': f'Failed to complete parent information: {str(e)}'}), 500
 
@@ -1616,50 +1680,22 @@ def check_profile_completion():
     """Check if user profile is complete and return missing fields"""
     try:
         user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
+        # User, parent and student records in one query
+        user = db.session.get(User, user_id, options=[
+            joinedload(User.parents), joinedload(User.student_records)
+        ])
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Get parent and student records
-        parent = Parent.query.filter_by(user_id=user_id).first()
-        student = Student.query.filter_by(user_id=user_id).first()
-        
-        missing_fields = []
+        parent = user.parents[0] if user.parents else None
+        student = user.student_records[0] if user.student_records else None
         
-        # Check user fields
-        if not user.full_name:
-            missing_fields.append('user_full_name')
-        if not user.email:
-            missing_fields.append('user_email')
-        if not user.phone:
-            missing_fields.append('user_phone')
-        if not user.gender:
-            missing_fields.append('user_gender')
-        
-        # Check parent fields
-        if parent:
-            if not parent.full_name:
-                missing_fields.append('parent_full_name')
-            if not parent.phone:
-                missing_fields.append('parent_phone')
-            if not parent.email:
-                missing_fields.append('parent_email')
-        else:
-            missing_fields.extend(['parent_full_name', 'parent_phone', 'parent_email'])
-        
-        # Check student fields
-        if student:
-            if not student.name:
-                missing_fields.append('student_name')
-            if not student.date_of_birth:
-                missing_fields.append('student_date_of_birth')
-        else:
-            missing_fields.extend(['student_name', 'student_date_of_birth'])
+        missing_fields = missing_profile_fields(user, parent, student)
         
         profile_complete = len(missing_fields) == 0
         
-        return jsonify({
+        response = json_response({
             'profile_complete': profile_complete,
             'missing_fields': missing_fields,
             'user': {
@@ -1680,11 +1716,15 @@ def check_profile_completion():
                 'name': student.name if student else None,
                 'date_of_birth': student.date_of_birth.isoformat() if student and student.date_of_birth else None
             } if student else None
-        }), 200
+        })
+        
+        # ETag of the body: an unchanged profile goes back as an empty 304, which
+        # saves the transfer only (the lookup and the body are still built)
+        response.set_etag(hashlib.blake2b(response.get_data(), digest_size=16).hexdigest())
+        return response.make_conditional(request)
         
     except Exception as e:
         print(f"❌ [PROFILE_CHECK] Error: {str(e)}")
-        import traceback
         traceback.print_exc()
         return jsonify({'error': f'Failed to check profile completion: {str(e)}'}), 500
 
@@ -1695,106 +1735,79 @@ def complete_profile():
     """Update user, parent, and student information to complete profile"""
     try:
         user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
+        # The user's parent record comes back with the user
+        user = db.session.get(User, user_id, options=[joinedload(User.parents)])
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        data = request.get_json()
+        # Strip submitted strings once, before the email uniqueness check
+        data = {key: value.strip() if isinstance(value, str) else value
+                for key, value in (request.get_json() or {}).items()}
         
         # Update user information
-        if 'user_full_name' in data and data['user_full_name']:
-            user.full_name = data['user_full_name'].strip()
-        if 'user_email' in data and data['user_email']:
-            # Check if email already exists for another user
-            existing_user = User.query.filter_by(email=data['user_email']).first()
-            if existing_user and existing_user.id != user_id:
+        error = apply_profile_updates(user, data, PROFILE_USER_UPDATES)
+        if error:
+            return jsonify({'error': error}), 400
+        if data.get('user_email'):
+            # Check if email already exists for another user (ids only, no User load)
+            email_taken = db.session.query(User.id).filter(
+                User.email == data['user_email'], User.id != user_id
+            ).first()
+            if email_taken:
                 return jsonify({'error': 'Email already in use by another account'}), 400
-            user.email = data['user_email'].strip()
+            user.email = data['user_email']
             user.email_verified = True
-        if 'user_phone' in data and data['user_phone']:
-            # Validate phone format
-            if not validate_phone(data['user_phone']):
-                return jsonify({'error': 'Invalid phone number format'}), 400
-            user.phone = data['user_phone'].strip()
-        if 'user_gender' in data and data['user_gender'] in ['male', 'female']:
+        if data.get('user_gender') in ('male', 'female'):
             user.gender = data['user_gender']
         
         # Update or CREATE parent information (parent is separate from student/user)
-        parent = Parent.query.filter_by(user_id=user_id).first()
+        parent = user.parents[0] if user.parents else None
         
         # Create parent if doesn't exist and parent data is provided
+        # No flush here: the fields below are set before the row is written, so a
+        # new parent goes out as a single INSERT instead of INSERT + UPDATE
         if not parent and ('parent_full_name' in data or 'parent_phone' in data or 'parent_email' in data):
             print(f"🆕 [PROFILE_COMPLETE] Creating new parent for user {user_id}")
             parent = Parent(user_id=user_id, mobile_app_enabled=False)
             db.session.add(parent)
-            db.session.flush()
         
         # Update parent fields if parent exists or was just created
         if parent:
-            if 'parent_full_name' in data and data['parent_full_name']:
-                parent.full_name = data['parent_full_name'].strip()
-            if 'parent_phone' in data and data['parent_phone']:
-                if not validate_phone(data['parent_phone']):
-                    return jsonify({'error': 'Invalid parent phone number format'}), 400
-                parent.phone = data['parent_phone'].strip()
-            if 'parent_email' in data and data['parent_email']:
-                parent.email = data['parent_email'].strip()
-            print(f"✅ [PROFILE_COMPLETE] Parent {parent.id} updated successfully")
+            error = apply_profile_updates(parent, data, PROFILE_PARENT_UPDATES)
+            if error:
+                return jsonify({'error': error}), 400
+            print(f"✅ [PROFILE_COMPLETE] Parent for user {user_id} updated successfully")
         
         # Update student information (student is linked to user - user IS the student)
         # Student table stores additional info, but user_id should match user.id
-        student = Student.query.get(user_id)  # Student ID = User ID for barcode holders
+        student = db.session.get(Student, user_id)  # Student ID = User ID for barcode holders
         
         if student:
-            # Student name should match user full_name
-            if 'user_full_name' in data and data['user_full_name']:
-                student.name = data['user_full_name'].strip()
+            apply_profile_updates(student, data, PROFILE_STUDENT_UPDATES)
             
-            if 'student_date_of_birth' in data and data['student_date_of_birth']:
-                from datetime import datetime
+            if data.get('student_date_of_birth'):
                 try:
                     # Parse date (format: YYYY-MM-DD)
                     student.date_of_birth = datetime.strptime(data['student_date_of_birth'], '%Y-%m-%d').date()
                 except ValueError:
                     return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
             
-            # Link parent to student if parent was created
+            # Link parent to student if parent was created (via the relationship,
+            # so a pending parent gets its id assigned in the same flush)
             if parent and student.parent_id != parent.id:
-                student.parent_id = parent.id
+                student.parent = parent
             
             print(f"✅ [PROFILE_COMPLETE] Student {student.id} updated successfully")
         
-        db.session.commit()
-        print(f"✅ [PROFILE_COMPLETE] User {user_id} profile updated successfully")
+        # Everything below is read before the commit, which expires the loaded
+        # objects (reading them afterwards would reload each row). The flush
+        # assigns a newly created parent its id.
+        db.session.flush()
         
         # Check if profile is now complete (email is optional)
-        missing_fields = []
-        if not user.full_name:
-            missing_fields.append('user_full_name')
-        # Email is optional - removed from required fields
-        if not user.phone:
-            missing_fields.append('user_phone')
-        if not user.gender:
-            missing_fields.append('user_gender')
-        if parent:
-            if not parent.full_name:
-                missing_fields.append('parent_full_name')
-            if not parent.phone:
-                missing_fields.append('parent_phone')
-            # Parent email is optional - removed from required fields
-        if student:
-            if not student.name:
-                missing_fields.append('student_name')
-            if not student.date_of_birth:
-                missing_fields.append('student_date_of_birth')
-        
-        # Auto-generate mobile credentials if eligible
-        credentials_result = None
-        if student and len(missing_fields) == 0:
-            credentials_result = auto_generate_mobile_credentials_if_eligible(student.id)
-            if credentials_result.get('generated'):
-                print(f"✅ [PROFILE_COMPLETE] Auto-generated mobile credentials for student {student.id}")
+        missing_fields = missing_profile_fields(user, parent, student, strict=False)
+        student_id = student.id if student else None
         
         response_data = {
             'success': True,
@@ -1823,20 +1836,33 @@ def complete_profile():
             } if student else None
         }
         
-        # Include mobile credentials if they were just generated
+        db.session.commit()
+        print(f"✅ [PROFILE_COMPLETE] User {user_id} profile updated successfully")
+        
+        # Auto-generate mobile credentials if eligible
+        credentials_result = None
+        if student_id and len(missing_fields) == 0:
+            credentials_result = auto_generate_mobile_credentials_if_eligible(student_id)
+            if credentials_result.get('generated'):
+                print(f"✅ [PROFILE_COMPLETE] Auto-generated mobile credentials for student {student_id}")
+        
+        # Include mobile credentials if they were just generated (generating them
+        # also enables the mobile app for that account)
         if credentials_result and credentials_result.get('generated'):
             response_data['mobile_credentials_generated'] = True
             if credentials_result.get('student_credentials'):
                 response_data['student_credentials'] = credentials_result['student_credentials']
+                response_data['student']['mobile_app_enabled'] = True
             if credentials_result.get('parent_credentials'):
                 response_data['parent_credentials'] = credentials_result['parent_credentials']
+                if response_data['parent']:
+                    response_data['parent']['mobile_app_enabled'] = True
         
-        return jsonify(response_data), 200
+        return json_response(response_data)
         
     except Exception as e:
         db.session.rollback()
         print(f"❌ [PROFILE_COMPLETE] Error: {str(e)}")
-        import traceback
         traceback.print_exc()
         return jsonify({'error': f'Failed to complete profile: {str(e)}'}), 500
 
@@ -1950,7 +1976,6 @@ def check_mobile_credentials_eligibility():
         
     except Exception as e:
         print(f"❌ [CHECK_ELIGIBILITY] Error: {str(e)}")
-        import traceback
         traceback.print_exc()
         return jsonify({'error': f'Failed to check eligibility: {str(e)}'}), 500
 
@@ -1991,7 +2016,6 @@ def generate_mobile_credentials_manual():
         
     except Exception as e:
         print(f"❌ [GENERATE_CREDENTIALS] Error: {str(e)}")
-        import traceback
         traceback.print_exc()
         return jsonify({'error': f'Failed to generate credentials: {str(e)}'}), 500
 
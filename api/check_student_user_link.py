@@ -3,43 +3,78 @@
 Quick diagnostic: Check student-user linkage in database
 """
 
+import sys
+
+from sqlalchemy import func, select
+
 from app import app
 from models import db, Student, User
 
+# Rows are pulled from a server-side cursor in batches of this size
+BATCH_SIZE = 1000
+
+# Only the columns this script prints are selected. Queries go through Core
+# select() and come back as plain rows, so no ORM objects, identity map entries
+# or lazy loads are involved at all.
+STUDENT_COLUMNS = (Student.id, Student.name, Student.user_id, Student.mobile_username, Student.mobile_app_enabled)
+
+def students_with_users(*extra_columns):
+    """Students LEFT JOIN users; linked_user_id is None when the user row is missing"""
+    return select(*STUDENT_COLUMNS, *extra_columns, User.id.label('linked_user_id'), User.phone.label('user_phone')) \
+        .select_from(Student) \
+        .outerjoin(User, User.id == Student.user_id)
+
 print("=" * 70)
 print("🔍 CHECKING STUDENT-USER LINKAGE")
 print("=" * 70)
 
 with app.app_context():
-    # Check the specific user from the logs
-    user = User.query.get(1)
+    # Check out one pooled connection up front; every query below runs on it
+    # and it is returned to the pool once, when the session closes at the end.
+    # All reads share one REPEATABLE READ transaction, so the report is a
+    # single consistent snapshot of the linkage; nothing is ever committed.
+    db.session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+
+    # Check the specific user from the logs, together with its linked student.
+    # Plain columns, no entities: the row's presence answers "does user 1 exist"
+    # and student_id answers "is a student linked", so neither path hydrates ORM objects
+    user = db.session.execute(
+        select(
+            User.full_name, User.phone, User.email,
+            Student.id.label('student_id'), Student.name.label('student_name'),
+            Student.mobile_username, Student.mobile_app_enabled
+        )
+        .select_from(User)
+        .outerjoin(Student, Student.user_id == User.id)
+        .where(User.id == 1)
+        .limit(1)
+    ).first()
     if user:
         print(f"\n✅ User ID 1 exists:")
         print(f"   Name: {user.full_name}")
         print(f"   Phone: {user.phone}")
         print(f"   Email: {user.email}")
         
-        # Try to find student with this user_id
-        student = Student.query.filter_by(user_id=1).first()
-        if student:
+        if user.student_id is not None:
             print(f"\n✅ Student linked to user_id=1:")
-            print(f"   Student ID: {student.id}")
-            print(f"   Name: {student.name}")
-            print(f"   Mobile Username: {student.mobile_username}")
-            print(f"   Mobile App Enabled: {student.mobile_app_enabled}")
+            print(f"   Student ID: {user.student_id}")
+            print(f"   Name: {user.student_name}")
+            print(f"   Mobile Username: {user.mobile_username}")
+            print(f"   Mobile App Enabled: {user.mobile_app_enabled}")
         else:
             print(f"\n❌ NO STUDENT found with user_id=1")
             
             # Check if there's a student with same phone
             print(f"\n🔍 Looking for students with any user having phone: {user.phone}")
-            all_students = Student.query.all()
-            print(f"   Total students in database: {len(all_students)}")
+            total_students = db.session.execute(select(func.count(Student.id))).scalar()
+            print(f"   Total students in database: {total_students}")
             
-            if all_students:
+            if total_students:
                 print(f"\n📋 First 5 students and their user_ids:")
-                for s in all_students[:5]:
-                    linked_user = User.query.get(s.user_id) if s.user_id else None
-                    user_phone = linked_user.phone if linked_user else "NO USER"
+                # Linked users come from the same statement, no per-student lookup
+                sample = db.session.execute(students_with_users().order_by(Student.id).limit(5))
+                for s in sample:
+                    user_phone = s.user_phone if s.linked_user_id else "NO USER"
                     print(f"   - Student ID {s.id}: {s.name}")
                     print(f"     user_id: {s.user_id}, linked phone: {user_phone}")
                     print(f"     mobile_username: {s.mobile_username}, enabled: {s.mobile_app_enabled}")
@@ -50,24 +85,44 @@ with app.app_context():
     print("🔍 CHECKING ALL STUDENTS WITH MOBILE ACCESS")
     print("=" * 70)
     
-    students_with_mobile = Student.query.filter_by(mobile_app_enabled=True).all()
+    # One Student LEFT JOIN User statement, read from a server-side cursor
+    students_with_mobile = db.session.execute(
+        students_with_users(Student.mobile_password_plain, User.full_name.label('user_full_name'))
+        .where(Student.mobile_app_enabled == True)
+        .order_by(Student.id)
+        .execution_options(stream_results=True, max_row_buffer=BATCH_SIZE)
+    )
     
-    if students_with_mobile:
-        print(f"\n✅ Found {len(students_with_mobile)} students with mobile access:\n")
-        for s in students_with_mobile:
-            linked_user = User.query.get(s.user_id) if s.user_id else None
-            print(f"📱 Student: {s.name}")
-            print(f"   - Student ID: {s.id}")
-            print(f"   - user_id: {s.user_id}")
-            print(f"   - Username: {s.mobile_username}")
-            print(f"   - Password: {s.mobile_password_plain}")
-            
-            if linked_user:
-                print(f"   - Linked User: {linked_user.full_name}")
-                print(f"   - Phone: {linked_user.phone}")
-            else:
-                print(f"   - ⚠️ WARNING: user_id {s.user_id} not found in users table!")
-            print()
+    # Streamed, so the total is only known once the loop has run
+    mobile_count = 0
+    # Report lines are buffered and written in chunks instead of one print() per line
+    lines = []
+    for s in students_with_mobile:
+        if mobile_count == 0:
+            lines.append("\n✅ Students with mobile access:\n")
+        mobile_count += 1
+        lines.append(f"📱 Student: {s.name}")
+        lines.append(f"   - Student ID: {s.id}")
+        lines.append(f"   - user_id: {s.user_id}")
+        lines.append(f"   - Username: {s.mobile_username}")
+        lines.append(f"   - Password: {s.mobile_password_plain}")
+        
+        if s.linked_user_id:
+            lines.append(f"   - Linked User: {s.user_full_name}")
+            lines.append(f"   - Phone: {s.user_phone}")
+        else:
+            lines.append(f"   - ⚠️ WARNING: user_id {s.user_id} not found in users table!")
+        lines.append("")
+        
+        if len(lines) >= BATCH_SIZE:
+            sys.stdout.write("\n".join(lines) + "\n")
+            lines.clear()
+    
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+    
+    if mobile_count:
+        print(f"✅ Found {mobile_count} students with mobile access")
     else:
         print("\n❌ No students have mobile_app_enabled=True")
         
@@ -75,3 +130,4 @@ with app.app_context():
         print("   UPDATE students SET mobile_app_enabled=1 WHERE id=YOUR_STUDENT_ID;")
     
     print("=" * 70)
+    db.session.close()
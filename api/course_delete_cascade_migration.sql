@@ -0,0 +1,36 @@
+-- Migration: Cascade course deletes to dependent rows
+-- Lets DELETE FROM courses remove registrations, sections, classes and their
+-- enrollments/attendances in one statement (models declare ondelete='CASCADE').
+--
+-- Constraint names below are MySQL's defaults for tables created by
+-- db.create_all(). Confirm each one with SHOW CREATE TABLE <table> and adjust
+-- the DROP FOREIGN KEY name before running.
+
+-- Registrations of a course
+ALTER TABLE registrations DROP FOREIGN KEY registrations_ibfk_3;
+ALTER TABLE registrations ADD CONSTRAINT fk_registrations_course
+    FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE;
+
+-- Classes (sections) of a course
+ALTER TABLE classes DROP FOREIGN KEY classes_ibfk_1;
+ALTER TABLE classes ADD CONSTRAINT fk_classes_course
+    FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE;
+
+-- Enrollments in a class
+ALTER TABLE enrollments DROP FOREIGN KEY enrollments_ibfk_2;
+ALTER TABLE enrollments ADD CONSTRAINT fk_enrollments_class
+    FOREIGN KEY (class_id) REFERENCES classes(id) ON DELETE CASCADE;
+
+-- Attendance records of a class
+ALTER TABLE attendances DROP FOREIGN KEY attendances_ibfk_2;
+ALTER TABLE attendances ADD CONSTRAINT fk_attendances_class
+    FOREIGN KEY (class_id) REFERENCES classes(id) ON DELETE CASCADE;
+
+-- Legacy course sections and their enrollments
+ALTER TABLE course_sections DROP FOREIGN KEY course_sections_ibfk_1;
+ALTER TABLE course_sections ADD CONSTRAINT fk_course_sections_course
+    FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE;
+
+ALTER TABLE section_enrollments DROP FOREIGN KEY section_enrollments_ibfk_2;
+ALTER TABLE section_enrollments ADD CONSTRAINT fk_section_enrollments_section
+    FOREIGN KEY (section_id) REFERENCES course_sections(id) ON DELETE CASCADE;
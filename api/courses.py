@@ -1,12 +1,22 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, make_response, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import func
+from sqlalchemy import and_, case, delete, func, insert, or_, select
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.orm import contains_eager, selectinload, raiseload
+import hashlib
+import re
 import logging
+import threading
 import time
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from functools import wraps
+from datetime import datetime, timedelta, time as dt_time
 import qrcode
 import base64
 from io import BytesIO
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
 from datetime import datetime, timedelta
 import qrcode
 import base64
@@ -15,11 +25,414 @@ from io import BytesIO
 courses_bp = Blueprint('courses', __name__)
 
 # Import models
-from models import db, Course, Registration, Student, User, Parent, Class, Enrollment, Attendance, CourseSection
+from models import db, Course, Registration, Student, User, Parent, Class, Enrollment, Attendance, CourseSection, format_class_schedule
+from utils import admin_required, json_bytes, json_response
 
 logger = logging.getLogger(__name__)
 
+# Interval between payments reported by /payment-info
+PAYMENT_INTERVAL = timedelta(days=30)
+
+# How long a generated course QR code stays valid
+QR_CODE_LIFETIME = timedelta(hours=24)
+
+# PNG text chunk recording which course id/name a stored QR image encodes
+QR_PAYLOAD_PNG_KEY = 'course'
+
+def _qr_course_key(course):
+    """The course part of the QR payload; a stored code is stale once this changes"""
+    return f"COURSE:{course.id}|NAME:{course.name}"
+
+def _stored_qr_course_key(qr_code_data):
+    """Course key saved in a stored QR image, or None (older codes carry none)"""
+    try:
+        return Image.open(BytesIO(base64.b64decode(qr_code_data))).text.get(QR_PAYLOAD_PNG_KEY)
+    except Exception:
+        return None
+
+# Schedule day names to day_of_week (0=Monday, 6=Sunday)
+DAYS_MAP = {
+    'Monday': 0, 'Tuesday': 1, 'Wednesday': 2, 'Thursday': 3,
+    'Friday': 4, 'Saturday': 5, 'Sunday': 6,
+    'Mon': 0, 'Tue': 1, 'Wed': 2, 'Thu': 3,
+    'Fri': 4, 'Sat': 5, 'Sun': 6
+}
+
+# Section schedule strings such as "Monday 09:00-10:30": day name, then an
+# optional HH:MM-HH:MM range, both pulled out in one match
+SCHEDULE_RE = re.compile(r'(\S+)\s+(?:(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})\b)?')
+
+# Course-name keywords for the ?level= filter (any keyword matches)
+LEVEL_KEYWORDS = {
+    'primary': ('ابتدائي',),
+    'middle': ('متوسط',),
+    'high': ('ثانوي',),
+    'preschool': ('روضة', 'تمهيدي', 'تحضيري'),
+}
+
+# Course-name keywords for the ?grade= filter (all keywords must match)
+GRADE_FILTERS = {
+    'preschool_3_4': ('تمهيدي', '3/4'),
+    'preschool_4_5': ('تمهيدي', '4/5'),
+    'preschool_5_6': ('تحضيري', '5/6'),
+    'preschool_year2': ('روضة', 'الثانية'),
+    'primary_1': ('ابتدائي', 'الأولى'),
+    'primary_2': ('ابتدائي', 'الثانية'),
+    'primary_3': ('ابتدائي', 'الثالثة'),
+    'primary_4': ('ابتدائي', 'الرابعة'),
+    'primary_5': ('ابتدائي', 'الخامسة'),
+    'middle_1': ('متوسط', 'الأولى'),
+    'middle_2': ('متوسط', 'الثانية'),
+    'middle_3': ('متوسط', 'الثالثة'),
+    'middle_4': ('متوسط', 'الرابعة'),
+    'high_1': ('ثانوي', 'الأولى'),
+    'high_2': ('ثانوي', 'الثانية'),
+    'high_3': ('ثانوي', 'الثالثة'),
+}
+
+# Static part of the /filters response, built once at import
+_PRICING_TYPES = ['session', 'monthly']
+
+# Detailed educational levels with specific grades
+_LEVELS = [
+    {
+        'id': 'preschool',
+        'name': 'روضة وتمهيدي',
+        'name_en': 'Preschool & Preparatory',
+        'grades': [
+            {'id': 'preschool_3_4', 'name': 'تمهيدي 3/4 سنوات'},
+            {'id': 'preschool_4_5', 'name': 'تمهيدي 4/5 سنوات'},
+            {'id': 'preschool_5_6', 'name': 'تحضيري 5/6 سنوات'},
+            {'id': 'preschool_year2', 'name': 'روضة السنة الثانية'}
+        ]
+    },
+    {
+        'id': 'primary',
+        'name': 'ابتدائي',
+        'name_en': 'Primary School',
+        'grades': [
+            {'id': 'primary_1', 'name': 'السنة الأولى'},
+            {'id': 'primary_2', 'name': 'السنة الثانية'},
+            {'id': 'primary_3', 'name': 'السنة الثالثة'},
+            {'id': 'primary_4', 'name': 'السنة الرابعة'},
+            {'id': 'primary_5', 'name': 'السنة الخامسة'}
+        ]
+    },
+    {
+        'id': 'middle',
+        'name': 'متوسط',
+        'name_en': 'Middle School',
+        'grades': [
+            {'id': 'middle_1', 'name': 'السنة الأولى'},
+            {'id': 'middle_2', 'name': 'السنة الثانية'},
+            {'id': 'middle_3', 'name': 'السنة الثالثة'},
+            {'id': 'middle_4', 'name': 'السنة الرابعة'}
+        ]
+    },
+    {
+        'id': 'high',
+        'name': 'ثانوي',
+        'name_en': 'High School',
+        'grades': [
+            {'id': 'high_1', 'name': 'السنة الأولى'},
+            {'id': 'high_2', 'name': 'السنة الثانية'},
+            {'id': 'high_3', 'name': 'السنة الثالثة'}
+        ]
+    }
+]
+
+# Subjects for each level
+_SUBJECTS = {
+    'preschool': ['تمهيدي', 'تحضيري', 'روضة'],
+    'primary': ['رياضيات', 'عربية', 'فرنسية', 'إنجليزية', 'تحسين الخط والكتابة'],
+    'middle': ['رياضيات', 'فيزياء', 'علوم', 'عربية', 'فرنسية', 'إنجليزية'],
+    'high': ['رياضيات', 'فيزياء', 'علوم', 'عربية', 'فرنسية', 'إنجليزية', 'تسيير واقتصاد', 'فلسفة']
+}
+
+# Price ranges
+_PRICE_RANGES = {
+    'session': {
+        'min': 400.00,
+        'max': 400.00,
+        'currency': 'DA'
+    },
+    'monthly': {
+        'min': 1500.00,
+        'max': 7500.00,
+        'currency': 'DA'
+    }
+}
+
+_FILTERS_STATIC = {
+    'pricing_types': _PRICING_TYPES,
+    'levels': _LEVELS,
+    'subjects': _SUBJECTS,
+    'price_ranges': _PRICE_RANGES,
+    'currency': 'DA'
+}
+
+# _FILTERS_STATIC serialized once, without its braces, so only categories are added per request
+_FILTERS_PREFIX = json_bytes(_FILTERS_STATIC)[1:-1]
+
+# Per-process cache for the public read-only course endpoints, keyed on path and
+# query string. Course, section and enrollment changes made in this module clear
+# it; anything else (admin edits, other workers) is picked up once an entry expires.
+VIEW_CACHE_TIMEOUT = 60  # seconds
+VIEW_CACHE_MAX_ENTRIES = 256  # least recently used entries are evicted beyond this
+# Query args a cached response may vary on. Requests with any other arg (including
+# the free-text search and subject) are not cached, so clients cannot mint keys.
+VIEW_CACHE_ARGS = frozenset(('category', 'pricing_type', 'level', 'grade'))
+_view_cache = OrderedDict()  # key -> (expires_at, body, etag), oldest use first
+_view_cache_lock = threading.Lock()
+
+def _store_view(key, body, etag):
+    """Insert a cache entry, dropping expired entries and the least recently used overflow"""
+    now = time.monotonic()
+    with _view_cache_lock:
+        for stale in [k for k, entry in _view_cache.items() if entry[0] <= now]:
+            del _view_cache[stale]
+        _view_cache[key] = (now + VIEW_CACHE_TIMEOUT, body, etag)
+        _view_cache.move_to_end(key)
+        while len(_view_cache) > VIEW_CACHE_MAX_ENTRIES:
+            _view_cache.popitem(last=False)
+
+def cached_view(view):
+    """Serve repeated GETs of a view from _view_cache for VIEW_CACHE_TIMEOUT seconds.
+
+    Responses carry an ETag of the body, so clients revalidating with
+    If-None-Match get an empty 304 (straight from the cache when it is warm).
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cacheable = VIEW_CACHE_ARGS.issuperset(request.args.keys())
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+        if cacheable:
+            with _view_cache_lock:
+                cached = _view_cache.get(key)
+                if cached and cached[0] > time.monotonic():
+                    _view_cache.move_to_end(key)
+                else:
+                    cached = None
+            if cached:
+                response = current_app.response_class(cached[1], mimetype='application/json')
+                response.set_etag(cached[2])
+                return response.make_conditional(request)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            body = response.get_data()
+            etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+            if cacheable:
+                _store_view(key, body, etag)
+            response.set_etag(etag)
+            response = response.make_conditional(request)
+        return response
+    return wrapper
+
+def clear_view_cache():
+    """Drop cached course listings after courses or sections change"""
+    with _view_cache_lock:
+        _view_cache.clear()
+
+# Columns serialized by the course listing
+COURSE_LIST_COLUMNS = (
+    Course.id,
+    Course.name,
+    Course.name_en,
+    Course.name_ar,
+    Course.description,
+    Course.description_en,
+    Course.description_ar,
+    Course.price,
+    Course.session_price,
+    Course.monthly_price,
+    Course.pricing_type,
+    Course.session_duration,
+    Course.max_students,
+    Course.category,
+    Course.is_active,
+    Course.image_url,
+    Course.created_at,
+)
+
+def _hm(t):
+    """Format a time as HH:MM (None passes through); cheaper than strftime per row"""
+    return f"{t.hour:02d}:{t.minute:02d}" if t else None
+
+def _parse_hm(value):
+    """Parse 'HH:MM' into a time; falls back to strptime (and its ValueError) for other forms"""
+    if len(value) == 5 and value[2] == ':' and value[:2].isdigit() and value[3:].isdigit():
+        return dt_time(int(value[:2]), int(value[3:]))
+    return datetime.strptime(value, '%H:%M').time()
+
+# Class columns serialized by the section listings (no qr_code_data and friends)
+SECTION_LIST_COLUMNS = (
+    Class.id,
+    Class.course_id,
+    Class.name,
+    Class.day_of_week,
+    Class.start_time,
+    Class.end_time,
+    Class.multi_day_schedule,
+    Class.max_students,
+    Class.is_active,
+    Class.created_at,
+)
+
+def _pricing_info(course):
+    """Build the pricing_info dict for a course row, converting each price once"""
+    pricing_info = {
+        'pricing_type': course.pricing_type,
+        'currency': 'DA',  # Algerian Dinar
+    }
+
+    if course.pricing_type == 'session':
+        session_price = float(course.session_price or course.price)
+        pricing_info.update({
+            'session_price': session_price,
+            'session_duration_hours': course.session_duration,
+            'display_price': f"{session_price} DA/session ({course.session_duration}h)"
+        })
+    elif course.pricing_type == 'monthly':
+        monthly_price = float(course.monthly_price or course.price)
+        pricing_info.update({
+            'monthly_price': monthly_price,
+            'display_price': f"{monthly_price} DA/month"
+        })
+
+    return pricing_info
+
+def _count(model, **where):
+    """SELECT COUNT(*) FROM model WHERE ... without Query.count()'s wrapping subquery"""
+    return db.session.execute(
+        select(func.count()).select_from(model).filter_by(**where)
+    ).scalar()
+
+def _active_enrollment_count():
+    """COUNT of active enrollments for use alongside a plain COUNT(Enrollment.id)
+
+    MySQL has no aggregate FILTER clause, so the CASE yields NULL (not counted)
+    for inactive rows and both counts come out of the same grouped scan.
+    """
+    return func.count(case((Enrollment.is_active == True, Enrollment.id)))
+
+def _categories_json(*criteria):
+    """Distinct active course categories as a JSON array string built by MySQL"""
+    categories = db.session.query(Course.category).filter(
+        Course.is_active == True, *criteria
+    ).distinct().subquery()
+    return db.session.query(
+        func.coalesce(func.json_arrayagg(categories.c.category), func.json_array())
+    ).scalar()
+
+# Columns covered by the ix_courses_search FULLTEXT index (MATCH needs the exact list)
+COURSE_SEARCH_COLUMNS = (
+    Course.name,
+    Course.name_ar,
+    Course.name_en,
+    Course.description,
+    Course.description_ar,
+    Course.description_en,
+)
+
+# Characters with a meaning in BOOLEAN MODE; stripped so user input is always plain words
+_BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+
+# Shortest term the ngram parser indexes (MySQL's default ngram_token_size)
+NGRAM_TOKEN_SIZE = 2
+
+# The ngram parser drops every ngram containing an InnoDB stopword ('a', 'i', 'at',
+# ...), which only occur in Latin text; such queries keep the ILIKE scan
+_LATIN_LETTERS = re.compile(r'[A-Za-z\u00c0-\u024f]')
+
+# MySQL ER_FT_MATCHING_KEY_NOT_FOUND: MATCH without a FULLTEXT index on its columns
+ER_FT_MATCHING_KEY_NOT_FOUND = 1191
+
+# Cleared the first time MATCH fails because ix_courses_search is missing
+# (performance_indexes_migration.sql not applied); searches then use ILIKE
+_fulltext_search_available = True
+
+def _ilike_search_filter(search_query):
+    """The original substring search over the course text columns"""
+    search_filter = f"%{search_query}%"
+    return or_(*[column.ilike(search_filter) for column in COURSE_SEARCH_COLUMNS])
+
+def _is_missing_fulltext_index(error):
+    """Whether a database error is MATCH running without its FULLTEXT index"""
+    args = getattr(error.orig, 'args', None)
+    return bool(args) and args[0] == ER_FT_MATCHING_KEY_NOT_FOUND
+
+def _search_filter(search_query):
+    """Filter clause for ?search=, every word required (like a web search box).
+
+    Each word becomes a quoted +"..." phrase in BOOLEAN MODE so it is matched as
+    a run of ngrams. Terms shorter than the ngram size are not in the index, and
+    Latin-script terms can lose stopword ngrams, so such queries fall back to the
+    old ILIKE scan, as do all queries once the FULLTEXT index turned out to be missing.
+    """
+    terms = _BOOLEAN_OPERATORS.sub(' ', search_query).split()
+    if not terms:
+        return None
+
+    if (not _fulltext_search_available or _LATIN_LETTERS.search(search_query)
+            or any(len(term) < NGRAM_TOKEN_SIZE for term in terms)):
+        return _ilike_search_filter(search_query)
+
+    boolean_query = ' '.join(f'+"{term}"' for term in terms)
+    return match(*COURSE_SEARCH_COLUMNS, against=boolean_query).in_boolean_mode()
+
+def _pick_section(course_id, requested_section_id=None):
+    """Choose the section for a new enrollment with a single query.
+
+    Loads the course's active sections together with their active enrollment
+    counts, least-full first. The chosen section row is then locked FOR UPDATE
+    and its count re-read under the lock, so concurrent registrations for the
+    same section queue up instead of both passing the capacity check. The lock
+    is held until the caller commits or rolls back.
+
+    Returns (section, enrollment_count, error) where error is a
+    (message, status_code) tuple when no section can be assigned.
+    """
+    sections = db.session.query(
+        Class,
+        func.count(Enrollment.id).label('enrollment_count')
+    ).outerjoin(
+        Enrollment,
+        (Enrollment.class_id == Class.id) & (Enrollment.is_active == True)
+    ).filter(
+        Class.course_id == course_id,
+        Class.is_active == True
+    ).group_by(Class.id).order_by('enrollment_count', Class.id).all()
+
+    if not sections:
+        return None, None, ('No active sections available for this course', 409)
+
+    if len(sections) == 1:
+        # Only one section available, assign directly
+        section, enrollment_count = sections[0]
+    elif requested_section_id:
+        # A specific section was requested
+        requested = next((row for row in sections if str(row[0].id) == str(requested_section_id)), None)
+        if not requested:
+            return None, None, ('Specified section not found or not available', 400)
+        section, enrollment_count = requested
+    else:
+        # Multiple sections available, assign to the one with most available seats
+        section, enrollment_count = sections[0]
+
+    # Serialize registrations into this section, then recount with a locking read
+    # (a plain read would return this transaction's snapshot, not newer commits)
+    db.session.query(Class.id).filter(Class.id == section.id).with_for_update().one()
+    enrollment_count = db.session.execute(
+        select(func.count()).select_from(Enrollment).filter_by(
+            class_id=section.id, is_active=True
+        ).with_for_update(read=True)
+    ).scalar()
+
+    return section, enrollment_count, None
+
 @courses_bp.route('', methods=['GET'])
+@cached_view
 def get_courses():
     """Get all active courses with available seats and pricing information"""
     category_filter = request.args.get('category')
@@ -29,101 +442,55 @@ def get_courses():
     subject_filter = request.args.get('subject')  # subject name
     search_query = request.args.get('search')  # search in course name/description
 
-    query = Course.query.filter_by(is_active=True)
+    # Only the listed columns are selected (plain rows, no ORM instances); approved
+    # registrations are counted in the same query so seats need no per-course lookup
+    query = db.session.query(
+        *COURSE_LIST_COLUMNS,
+        func.count(Registration.id).label('approved_count')
+    ).outerjoin(
+        Registration,
+        (Registration.course_id == Course.id) & (Registration.status == 'approved')
+    ).filter(Course.is_active == True)
 
     if category_filter:
-        query = query.filter_by(category=category_filter)
+        query = query.filter(Course.category == category_filter)
 
     if pricing_type_filter:
-        query = query.filter_by(pricing_type=pricing_type_filter)
+        query = query.filter(Course.pricing_type == pricing_type_filter)
 
     # Handle level-based filtering
-    if level_filter:
-        if level_filter == 'primary':
-            query = query.filter(Course.name.contains('ابتدائي'))
-        elif level_filter == 'middle':
-            query = query.filter(Course.name.contains('متوسط'))
-        elif level_filter == 'high':
-            query = query.filter(Course.name.contains('ثانوي'))
-        elif level_filter == 'preschool':
-            query = query.filter(
-                (Course.name.contains('روضة')) |
-                (Course.name.contains('تمهيدي')) |
-                (Course.name.contains('تحضيري'))
-            )
+    level_keywords = LEVEL_KEYWORDS.get(level_filter)
+    if level_keywords:
+        query = query.filter(or_(*[Course.name.contains(keyword) for keyword in level_keywords]))
 
     # Handle specific grade filtering
-    if grade_filter:
-        if grade_filter == 'preschool_3_4':
-            query = query.filter(Course.name.contains('تمهيدي') & Course.name.contains('3/4'))
-        elif grade_filter == 'preschool_4_5':
-            query = query.filter(Course.name.contains('تمهيدي') & Course.name.contains('4/5'))
-        elif grade_filter == 'preschool_5_6':
-            query = query.filter(Course.name.contains('تحضيري') & Course.name.contains('5/6'))
-        elif grade_filter == 'preschool_year2':
-            query = query.filter(Course.name.contains('روضة') & Course.name.contains('الثانية'))
-        elif grade_filter == 'primary_1':
-            query = query.filter(Course.name.contains('ابتدائي') & Course.name.contains('الأولى'))
-        elif grade_filter == 'primary_2':
-            query = query.filter(Course.name.contains('ابتدائي') & Course.name.contains('الثانية'))
-        elif grade_filter == 'primary_3':
-            query = query.filter(Course.name.contains('ابتدائي') & Course.name.contains('الثالثة'))
-        elif grade_filter == 'primary_4':
-            query = query.filter(Course.name.contains('ابتدائي') & Course.name.contains('الرابعة'))
-        elif grade_filter == 'primary_5':
-            query = query.filter(Course.name.contains('ابتدائي') & Course.name.contains('الخامسة'))
-        elif grade_filter == 'middle_1':
-            query = query.filter(Course.name.contains('متوسط') & Course.name.contains('الأولى'))
-        elif grade_filter == 'middle_2':
-            query = query.filter(Course.name.contains('متوسط') & Course.name.contains('الثانية'))
-        elif grade_filter == 'middle_3':
-            query = query.filter(Course.name.contains('متوسط') & Course.name.contains('الثالثة'))
-        elif grade_filter == 'middle_4':
-            query = query.filter(Course.name.contains('متوسط') & Course.name.contains('الرابعة'))
-        elif grade_filter == 'high_1':
-            query = query.filter(Course.name.contains('ثانوي') & Course.name.contains('الأولى'))
-        elif grade_filter == 'high_2':
-            query = query.filter(Course.name.contains('ثانوي') & Course.name.contains('الثانية'))
-        elif grade_filter == 'high_3':
-            query = query.filter(Course.name.contains('ثانوي') & Course.name.contains('الثالثة'))
+    grade_keywords = GRADE_FILTERS.get(grade_filter)
+    if grade_keywords:
+        query = query.filter(*[Course.name.contains(keyword) for keyword in grade_keywords])
 
     # Handle subject filtering
     if subject_filter:
         query = query.filter(Course.name.contains(subject_filter))
 
-    # Handle search query
-    if search_query:
-        search_filter = f"%{search_query}%"
-        query = query.filter(
-            (Course.name.ilike(search_filter)) |
-            (Course.description.ilike(search_filter)) |
-            (Course.name_en.ilike(search_filter)) |
-            (Course.name_ar.ilike(search_filter)) |
-            (Course.description_en.ilike(search_filter)) |
-            (Course.description_ar.ilike(search_filter))
-        )
-
-    courses = query.all()
+    # Handle search query (served by the ix_courses_search FULLTEXT index)
+    search_filter = _search_filter(search_query) if search_query else None
+    try:
+        courses = (query.filter(search_filter) if search_filter is not None else query) \
+            .group_by(Course.id).all()
+    except DBAPIError as e:
+        if search_filter is None or not _is_missing_fulltext_index(e):
+            raise
+        # Database not migrated yet: remember that and redo the search with ILIKE
+        global _fulltext_search_available
+        _fulltext_search_available = False
+        db.session.rollback()
+        logger.warning("ix_courses_search FULLTEXT index missing; course search falls back to ILIKE")
+        courses = query.filter(_ilike_search_filter(search_query)).group_by(Course.id).all()
 
     courses_data = []
     for course in courses:
         # Build pricing information
-        pricing_info = {
-            'pricing_type': course.pricing_type,
-            'currency': 'DA',  # Algerian Dinar
-        }
-
-        if course.pricing_type == 'session':
-            pricing_info.update({
-                'session_price': float(course.session_price) if course.session_price else float(course.price),
-                'session_duration_hours': course.session_duration,
-                'display_price': f"{float(course.session_price) if course.session_price else float(course.price)} DA/session ({course.session_duration}h)"
-            })
-        elif course.pricing_type == 'monthly':
-            pricing_info.update({
-                'monthly_price': float(course.monthly_price) if course.monthly_price else float(course.price),
-                'display_price': f"{float(course.monthly_price) if course.monthly_price else float(course.price)} DA/month"
-            })
+        pricing_info = _pricing_info(course)
 
         courses_data.append({
             'id': course.id,
@@ -136,7 +503,7 @@ def get_courses():
             'price': float(course.price),  # Keep for backward compatibility
             'pricing_info': pricing_info,
             'total_seats': course.max_students,
-            'available_seats': course.max_students,  # Will be calculated properly later
+            'available_seats': max(0, course.max_students - course.approved_count),
             'category': course.category,
             'is_active': course.is_active,
             'image_url': course.image_url,
@@ -144,9 +511,10 @@ def get_courses():
             'created_at': course.created_at.isoformat() if course.created_at else None
         })
 
-    return jsonify({'courses': courses_data}), 200
+    return json_response({'courses': courses_data})
 
 @courses_bp.route('/<int:course_id>', methods=['GET'])
+@cached_view
 def get_course(course_id):
     """Get specific course details"""
     course = Course.query.get(course_id)
@@ -155,30 +523,12 @@ def get_course(course_id):
         return jsonify({'error': 'Course not found'}), 404
 
     # Count current registrations
-    registration_count = Registration.query.filter_by(
-        course_id=course.id,
-        status='approved'
-    ).count()
+    registration_count = _count(Registration, course_id=course.id, status='approved')
 
     available_seats = max(0, course.max_students - registration_count)
 
     # Build pricing information
-    pricing_info = {
-        'pricing_type': course.pricing_type,
-        'currency': 'DA',  # Algerian Dinar
-    }
-
-    if course.pricing_type == 'session':
-        pricing_info.update({
-            'session_price': float(course.session_price) if course.session_price else float(course.price),
-            'session_duration_hours': course.session_duration,
-            'display_price': f"{float(course.session_price) if course.session_price else float(course.price)} DA/session ({course.session_duration}h)"
-        })
-    elif course.pricing_type == 'monthly':
-        pricing_info.update({
-            'monthly_price': float(course.monthly_price) if course.monthly_price else float(course.price),
-            'display_price': f"{float(course.monthly_price) if course.monthly_price else float(course.price)} DA/month"
-        })
+    pricing_info = _pricing_info(course)
 
     return jsonify({
         'course': {
@@ -202,95 +552,15 @@ def get_course(course_id):
     }), 200
 
 @courses_bp.route('/filters', methods=['GET'])
+@cached_view
 def get_course_filters():
     """Get available course filters and categories"""
-    # Get unique categories
-    categories = db.session.query(Course.category).filter(Course.is_active == True).distinct().all()
-    categories = [cat[0] for cat in categories]
-
-    # Get pricing types
-    pricing_types = ['session', 'monthly']
-
-    # Define detailed educational levels with specific grades
-    levels = [
-        {
-            'id': 'preschool',
-            'name': 'روضة وتمهيدي',
-            'name_en': 'Preschool & Preparatory',
-            'grades': [
-                {'id': 'preschool_3_4', 'name': 'تمهيدي 3/4 سنوات'},
-                {'id': 'preschool_4_5', 'name': 'تمهيدي 4/5 سنوات'},
-                {'id': 'preschool_5_6', 'name': 'تحضيري 5/6 سنوات'},
-                {'id': 'preschool_year2', 'name': 'روضة السنة الثانية'}
-            ]
-        },
-        {
-            'id': 'primary',
-            'name': 'ابتدائي',
-            'name_en': 'Primary School',
-            'grades': [
-                {'id': 'primary_1', 'name': 'السنة الأولى'},
-                {'id': 'primary_2', 'name': 'السنة الثانية'},
-                {'id': 'primary_3', 'name': 'السنة الثالثة'},
-                {'id': 'primary_4', 'name': 'السنة الرابعة'},
-                {'id': 'primary_5', 'name': 'السنة الخامسة'}
-            ]
-        },
-        {
-            'id': 'middle',
-            'name': 'متوسط',
-            'name_en': 'Middle School',
-            'grades': [
-                {'id': 'middle_1', 'name': 'السنة الأولى'},
-                {'id': 'middle_2', 'name': 'السنة الثانية'},
-                {'id': 'middle_3', 'name': 'السنة الثالثة'},
-                {'id': 'middle_4', 'name': 'السنة الرابعة'}
-            ]
-        },
-        {
-            'id': 'high',
-            'name': 'ثانوي',
-            'name_en': 'High School',
-            'grades': [
-                {'id': 'high_1', 'name': 'السنة الأولى'},
-                {'id': 'high_2', 'name': 'السنة الثانية'},
-                {'id': 'high_3', 'name': 'السنة الثالثة'}
-            ]
-        }
-    ]
-
-    # Get subjects for each level
-    subjects = {
-        'preschool': ['تمهيدي', 'تحضيري', 'روضة'],
-        'primary': ['رياضيات', 'عربية', 'فرنسية', 'إنجليزية', 'تحسين الخط والكتابة'],
-        'middle': ['رياضيات', 'فيزياء', 'علوم', 'عربية', 'فرنسية', 'إنجليزية'],
-        'high': ['رياضيات', 'فيزياء', 'علوم', 'عربية', 'فرنسية', 'إنجليزية', 'تسيير واقتصاد', 'فلسفة']
-    }
+    # Get unique categories (as a JSON array from the database) and splice them
+    # into the pre-serialized static filters
+    categories_json = _categories_json()
+    body = b'{"filters":{' + _FILTERS_PREFIX + b',"categories":' + categories_json.encode('utf-8') + b'}}'
 
-    # Get price ranges
-    price_ranges = {
-        'session': {
-            'min': 400.00,
-            'max': 400.00,
-            'currency': 'DA'
-        },
-        'monthly': {
-            'min': 1500.00,
-            'max': 7500.00,
-            'currency': 'DA'
-        }
-    }
-
-    return jsonify({
-        'filters': {
-            'categories': categories,
-            'pricing_types': pricing_types,
-            'levels': levels,
-            'subjects': subjects,
-            'price_ranges': price_ranges,
-            'currency': 'DA'
-        }
-    }), 200
+    return current_app.response_class(body, mimetype='application/json'), 200
 
 @courses_bp.route('/register', methods=['POST'])
 @jwt_required()
@@ -339,39 +609,22 @@ def register_for_course():
         # Use the actual student ID
         actual_student_id = student.id
 
-        # Check if already enrolled
-        existing_enrollment = Enrollment.query.filter_by(
-            student_id=actual_student_id,
-            class_id=Class.query.filter_by(course_id=course_id).subquery().c.id
+        # Check if already enrolled in any section of this course
+        existing_enrollment = db.session.query(Enrollment.id).join(Class).filter(
+            Enrollment.student_id == actual_student_id,
+            Class.course_id == course_id,
+            Enrollment.is_active == True
         ).first()
 
         if existing_enrollment:
             return jsonify({'error': 'Already enrolled in this course'}), 409
 
-        # Get available sections for this course
-        available_sections = Class.query.filter_by(course_id=course_id, is_active=True).all()
-
-        if not available_sections:
-            return jsonify({'error': 'No active sections available for this course'}), 409
-
-        # Determine which section to assign
-        assigned_section = None
-
-        if len(available_sections) == 1:
-            # Only one section available, assign directly
-            assigned_section = available_sections[0]
-        elif section_id:
-            # User specified a section
-            assigned_section = Class.query.filter_by(id=section_id, course_id=course_id, is_active=True).first()
-            if not assigned_section:
-                return jsonify({'error': 'Specified section not found or not available'}), 400
-        else:
-            # Multiple sections available, assign to the one with most available seats
-            assigned_section = min(available_sections, 
-                                 key=lambda s: Enrollment.query.filter_by(class_id=s.id, is_active=True).count())
+        # Determine which section to assign (sections and their loads in one query)
+        assigned_section, current_enrollments, error = _pick_section(course_id, section_id)
+        if error:
+            return jsonify({'error': error[0]}), error[1]
 
         # Check if section has available seats
-        current_enrollments = Enrollment.query.filter_by(class_id=assigned_section.id, is_active=True).count()
         if current_enrollments >= assigned_section.max_students:
             return jsonify({'error': 'No available seats in the selected section'}), 409
 
@@ -386,6 +639,7 @@ def register_for_course():
 
         db.session.add(enrollment)
         db.session.commit()
+        clear_view_cache()
 
         return jsonify({
             'message': 'Enrollment request submitted successfully',
@@ -406,7 +660,7 @@ def register_for_course():
         return jsonify({'error': 'Student not found or does not belong to you'}), 404
 
     # Check if already enrolled
-    existing_enrollment = Enrollment.query.join(Class).filter(
+    existing_enrollment = db.session.query(Enrollment.id).join(Class).filter(
         Enrollment.student_id == student_id,
         Class.course_id == course_id,
         Enrollment.is_active == True
@@ -415,30 +669,12 @@ def register_for_course():
     if existing_enrollment:
         return jsonify({'error': 'Already enrolled in this course'}), 409
 
-    # Get available sections for this course
-    available_sections = Class.query.filter_by(course_id=course_id, is_active=True).all()
-
-    if not available_sections:
-        return jsonify({'error': 'No active sections available for this course'}), 409
-
-    # Determine which section to assign
-    assigned_section = None
-
-    if len(available_sections) == 1:
-        # Only one section available, assign directly
-        assigned_section = available_sections[0]
-    elif section_id:
-        # Parent specified a section
-        assigned_section = Class.query.filter_by(id=section_id, course_id=course_id, is_active=True).first()
-        if not assigned_section:
-            return jsonify({'error': 'Specified section not found or not available'}), 400
-    else:
-        # Multiple sections available, assign to the one with most available seats
-        assigned_section = min(available_sections, 
-                             key=lambda s: Enrollment.query.filter_by(class_id=s.id, is_active=True).count())
+    # Determine which section to assign (sections and their loads in one query)
+    assigned_section, current_enrollments, error = _pick_section(course_id, section_id)
+    if error:
+        return jsonify({'error': error[0]}), error[1]
 
     # Check if section has available seats
-    current_enrollments = Enrollment.query.filter_by(class_id=assigned_section.id, is_active=True).count()
     if current_enrollments >= assigned_section.max_students:
         return jsonify({'error': 'No available seats in the selected section'}), 409
 
@@ -452,6 +688,7 @@ def register_for_course():
 
     db.session.add(enrollment)
     db.session.commit()
+    clear_view_cache()
 
     return jsonify({
         'message': 'Successfully enrolled student in course',
@@ -471,29 +708,31 @@ def get_my_registrations():
     if not parent:
         return jsonify({'registrations': []}), 200
     
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            # Get enrollments instead of registrations
-            enrollments = db.session.query(Enrollment).join(Student).filter(
-                Student.parent_id == parent.id
-            ).all()
-            break  # Success, exit retry loop
-        except Exception as e:
-            if attempt == max_retries - 1:  # Last attempt
-                logger.error(f"Database error after {max_retries} attempts: {e}")
-                return jsonify({
-                    'error': 'Database temporarily unavailable', 
-                    'message': 'Please try again in a few moments'
-                }), 503
-            logger.warning(f"Database attempt {attempt + 1} failed: {e}")
-            time.sleep(1)  # Wait 1 second before retry
+    # Stale pooled connections are already replaced at checkout (pool_pre_ping), so a
+    # failure here means the database is down; fail fast instead of sleeping and retrying
+    try:
+        # Get enrollments instead of registrations, with student, section and course
+        # loaded up front; raiseload('*') flags any relationship the loop still lazy-loads
+        enrollments = db.session.query(Enrollment).join(Student).filter(
+            Student.parent_id == parent.id
+        ).options(
+            contains_eager(Enrollment.student),
+            selectinload(Enrollment.class_).selectinload(Class.course),
+            raiseload('*')
+        ).all()
+    except OperationalError as e:
+        db.session.rollback()
+        logger.error(f"Database error loading registrations: {e}")
+        return jsonify({
+            'error': 'Database temporarily unavailable', 
+            'message': 'Please try again in a few moments'
+        }), 503
 
     # Format enrollments for frontend compatibility
     formatted_enrollments = []
     for enrollment in enrollments:
-        course = enrollment.course
         class_info = enrollment.class_
+        course = class_info.course if class_info else None
         student = enrollment.student
         
         formatted_enrollments.append({
@@ -520,10 +759,10 @@ def get_my_registrations():
             'debt_sessions': enrollment.debt_sessions or 0
         })
 
-    return jsonify({
+    return json_response({
         'registrations': formatted_enrollments,
         'total': len(formatted_enrollments)
-    }), 200
+    })
 
 @courses_bp.route('/payment-info', methods=['GET'])
 @jwt_required()
@@ -531,13 +770,18 @@ def get_payment_info():
     """Get user's payment information"""
     user_id = int(get_jwt_identity())
 
-    # Get user's approved registrations
-    approved_registrations = Registration.query.filter_by(
-        user_id=user_id,
-        status='approved'
-    ).all()
+    # Count the user's approved registrations and sum their course prices in SQL
+    registration_count, total_price = db.session.execute(
+        select(
+            func.count(Registration.id),
+            func.coalesce(func.sum(Course.price), 0)
+        ).select_from(Registration).join(Course, Registration.course_id == Course.id).where(
+            Registration.user_id == user_id,
+            Registration.status == 'approved'
+        )
+    ).one()
 
-    if not approved_registrations:
+    if not registration_count:
         return jsonify({
             'total_paid': 0,
             'amount_due': 0,
@@ -546,29 +790,25 @@ def get_payment_info():
         }), 200
 
     # Calculate total paid (sum of course prices for approved registrations)
-    total_paid = sum(float(reg.course.price) for reg in approved_registrations)
+    total_paid = float(total_price)
 
-    next_payment_due = (datetime.now() + timedelta(days=30)).isoformat()
+    now = datetime.now()
+    next_payment_due = (now + PAYMENT_INTERVAL).isoformat()
     amount_due = total_paid * 0.1  # Assume 10% of total as next payment
 
     return jsonify({
         'total_paid': total_paid,
         'amount_due': amount_due,
         'next_payment_due': next_payment_due,
-        'last_payment_date': datetime.now().isoformat()
+        'last_payment_date': now.isoformat()
     }), 200
 
 # Admin routes
 @courses_bp.route('', methods=['POST'])
 @jwt_required()
+@admin_required
 def create_course():
     """Create a new course (Admin only)"""
-    user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
-
-    if user.role != 'admin':
-        return jsonify({'error': 'Admin access required'}), 403
-
     data = request.get_json()
 
     required_fields = ['name', 'price', 'max_students']
@@ -576,46 +816,40 @@ def create_course():
         if field not in data:
             return jsonify({'error': f'{field} is required'}), 400
 
-    course = Course(
+    # Plain INSERTs: the new ids come back from the driver's lastrowid, so no
+    # flush or ORM instances are needed (MySQL has no INSERT ... RETURNING)
+    course_id = db.session.execute(insert(Course).values(
         name=data['name'],
         description=data.get('description', ''),
         price=data['price'],
         max_students=data['max_students']
-    )
-
-    db.session.add(course)
-    db.session.flush()  # Get the course ID before committing
+    )).inserted_primary_key[0]
 
     # Create a default section for the course
-    default_section = Class(
-        course_id=course.id,
-        name=f"{course.name} - Section 1",
+    section_id = db.session.execute(insert(Class).values(
+        course_id=course_id,
+        name=f"{data['name']} - Section 1",
         day_of_week=1,  # Monday by default
         start_time="09:00:00",
         end_time="10:30:00",
         max_students=data['max_students'],  # Use course max_students as default
         is_active=True
-    )
+    )).inserted_primary_key[0]
 
-    db.session.add(default_section)
     db.session.commit()
+    clear_view_cache()
 
     return jsonify({
         'message': 'Course created successfully with default section',
-        'course_id': course.id,
-        'section_id': default_section.id
+        'course_id': course_id,
+        'section_id': section_id
     }), 201
 
 @courses_bp.route('/<int:course_id>', methods=['PUT'])
 @jwt_required()
+@admin_required
 def update_course(course_id):
     """Update course (Admin only)"""
-    user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
-
-    if user.role != 'admin':
-        return jsonify({'error': 'Admin access required'}), 403
-
     course = Course.query.get(course_id)
     if not course:
         return jsonify({'error': 'Course not found'}), 404
@@ -634,45 +868,58 @@ def update_course(course_id):
         course.is_active = data['is_active']
 
     db.session.commit()
+    clear_view_cache()
 
     return jsonify({'message': 'Course updated successfully'}), 200
 
 @courses_bp.route('/<int:course_id>', methods=['DELETE'])
 @jwt_required()
+@admin_required
 def delete_course(course_id):
     """Delete course (Admin only)"""
-    user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
-
-    if user.role != 'admin':
-        return jsonify({'error': 'Admin access required'}), 403
-
     course = Course.query.get(course_id)
     if not course:
         return jsonify({'error': 'Course not found'}), 404
 
     # Check if course has active registrations
-    active_registrations = Registration.query.filter_by(
-        course_id=course_id,
-        status='approved'
-    ).count()
+    active_registrations = _count(Registration, course_id=course_id, status='approved')
 
     if active_registrations > 0:
         return jsonify({'error': 'Cannot delete course with active registrations'}), 409
 
-    try:
-        # Delete all registrations for this course (this will cascade to payments)
-        Registration.query.filter_by(course_id=course_id).delete()
-
-        # Delete all course sections for this course (this will cascade to section enrollments)
-        CourseSection.query.filter_by(course_id=course_id).delete()
-
-        # Delete all classes for this course (this will cascade to enrollments and attendances)
-        Class.query.filter_by(course_id=course_id).delete()
+    # Enrollments and attendances cascade with the course's classes, so refuse while
+    # any of them are still in use or owed for
+    course_class_ids = select(Class.id).where(Class.course_id == course_id)
+    active_enrollments = db.session.execute(
+        select(func.count()).select_from(Enrollment).where(
+            Enrollment.class_id.in_(course_class_ids), Enrollment.is_active == True
+        )
+    ).scalar()
+    if active_enrollments > 0:
+        return jsonify({'error': 'Cannot delete course with active enrollments'}), 409
+
+    unpaid_attendances = db.session.execute(
+        select(func.count()).select_from(Attendance).where(
+            Attendance.class_id.in_(course_class_ids),
+            Attendance.payment_status.in_(('unpaid', 'debt'))
+        )
+    ).scalar()
+    if unpaid_attendances > 0:
+        return jsonify({'error': 'Cannot delete course with unpaid attendance records'}), 409
 
-        # Finally delete the course
-        db.session.delete(course)
+    try:
+        # Registrations, sections and classes are removed by ON DELETE CASCADE
+        # (course_delete_cascade_migration.sql); the explicit bulk deletes keep this
+        # working on databases that have not been migrated yet. None of these
+        # statements load rows into the session first.
+        Registration.query.filter_by(course_id=course_id).delete(synchronize_session=False)
+        CourseSection.query.filter_by(course_id=course_id).delete(synchronize_session=False)
+        Class.query.filter_by(course_id=course_id).delete(synchronize_session=False)
+
+        # Finally delete the course (a plain DELETE, without loading its collections)
+        db.session.execute(delete(Course).where(Course.id == course_id))
         db.session.commit()
+        clear_view_cache()
 
         return jsonify({'message': 'Course and all related data deleted successfully'}), 200
 
@@ -682,70 +929,96 @@ def delete_course(course_id):
         return jsonify({'error': 'Failed to delete course and related data'}), 500
 
 @courses_bp.route('/categories', methods=['GET'])
+@cached_view
 def get_categories():
     """Get all available course categories"""
-    categories = db.session.query(Course.category).filter(Course.is_active == True).distinct().all()
-    
-    category_list = [cat[0] for cat in categories if cat[0]]
-    
-    return jsonify({'categories': category_list}), 200
+    # The array is aggregated in the database and spliced into the body as-is
+    categories_json = _categories_json(Course.category.isnot(None), Course.category != '')
+
+    return current_app.response_class(
+        '{"categories":' + categories_json + '}', mimetype='application/json'
+    ), 200
 
 # Course Sections Endpoints
 @courses_bp.route('/<int:course_id>/sections', methods=['GET'])
+@cached_view
 def get_course_sections(course_id):
     """Get all sections for a specific course"""
-    course = Course.query.get_or_404(course_id)
+    course = db.session.query(Course.name, Course.category).filter(Course.id == course_id).first()
+    if not course:
+        abort(404)
 
-    # Optimized query: Get sections with enrollment counts in a single query
+    # Optimized query: Get sections with active and total enrollment counts in a single query,
+    # selecting only the serialized columns (plain rows, no Class instances)
     sections_query = db.session.query(
-        Class,
-        func.count(Enrollment.id).label('enrollment_count')
+        *SECTION_LIST_COLUMNS,
+        _active_enrollment_count().label('enrollment_count'),
+        func.count(Enrollment.id).label('total_enrollments')
     ).outerjoin(
-        Enrollment,
-        (Enrollment.class_id == Class.id) & (Enrollment.is_active == True)
+        Enrollment, Enrollment.class_id == Class.id
     ).filter(
         Class.course_id == course_id
     ).group_by(Class.id).all()
 
     sections_data = []
-    for section, enrollment_count in sections_query:
+    for section in sections_query:
         sections_data.append({
             'id': section.id,
             'course_id': section.course_id,
             'course_name': course.name,
             'course_category': course.category,
             'section_name': section.name,
-            'schedule': section.schedule,  # This will use the @property method
-            'start_date': section.start_time.strftime('%H:%M') if section.start_time else None,
-            'end_date': section.end_time.strftime('%H:%M') if section.end_time else None,
+            'schedule': format_class_schedule(section.day_of_week, section.start_time,
+                                              section.end_time, section.multi_day_schedule),
+            'start_date': _hm(section.start_time),
+            'end_date': _hm(section.end_time),
             'max_students': section.max_students,
-            'current_students': enrollment_count,
+            'current_students': section.enrollment_count,
+            'total_enrollments': section.total_enrollments,
             'is_active': section.is_active,
             'created_at': section.created_at.isoformat() if section.created_at else None
         })
 
-    return jsonify({'sections': sections_data}), 200
+    return json_response({'sections': sections_data})
 
 @courses_bp.route('/sections/all', methods=['GET'])
+@cached_view
 def get_all_sections():
     """Get all sections for all courses with enrollment counts"""
-    # Optimized query: Get all sections with enrollment counts in a single query
+    # Optimized query: Get all sections with active and total enrollment counts in a single query
     sections_query = db.session.query(
-        Class,
+        *SECTION_LIST_COLUMNS,
         Course.name.label('course_name'),
         Course.category.label('course_category'),
-        func.count(Enrollment.id).label('enrollment_count')
+        _active_enrollment_count().label('enrollment_count'),
+        func.count(Enrollment.id).label('total_enrollments')
     ).join(
         Course, Class.course_id == Course.id
     ).outerjoin(
-        Enrollment,
-        (Enrollment.class_id == Class.id) & (Enrollment.is_active == True)
+        Enrollment, Enrollment.class_id == Class.id
     ).filter(
         Course.is_active == True
-    ).group_by(Class.id, Course.name, Course.category).all()
+    ).group_by(Class.id, Course.id).all()
+
+    # The nested course object is identical for every section of a course, so it
+    # is built once per course and shared between rows
+    course_objects = {}
 
     sections_data = []
-    for section, course_name, course_category, enrollment_count in sections_query:
+    for section in sections_query:
+        course_name = section.course_name
+        course_category = section.course_category
+        enrollment_count = section.enrollment_count
+        start_time = _hm(section.start_time)
+        end_time = _hm(section.end_time)
+        course_object = course_objects.get(section.course_id)
+        if course_object is None:
+            course_object = course_objects[section.course_id] = {
+                'id': section.course_id,
+                'name': course_name,
+                'category': course_category,
+                'is_active': True
+            }
         sections_data.append({
             'id': section.id,
             'course_id': section.course_id,
@@ -753,37 +1026,29 @@ def get_all_sections():
             'course_name': course_name,
             'course_category': course_category,
             'section_name': section.name,
-            'schedule': section.schedule,  # This will use the @property method
+            'schedule': format_class_schedule(section.day_of_week, section.start_time,
+                                              section.end_time, section.multi_day_schedule),
             'multi_day_schedule': section.multi_day_schedule,  # Include for kindergarten support
-            'start_date': section.start_time.strftime('%H:%M') if section.start_time else None,
-            'end_date': section.end_time.strftime('%H:%M') if section.end_time else None,
-            'start_time': section.start_time.strftime('%H:%M') if section.start_time else None,
-            'end_time': section.end_time.strftime('%H:%M') if section.end_time else None,
+            'start_date': start_time,
+            'end_date': end_time,
+            'start_time': start_time,
+            'end_time': end_time,
             'max_students': section.max_students,
             'current_students': enrollment_count,
             'enrolled_students': enrollment_count,
+            'total_enrollments': section.total_enrollments,
             'is_active': section.is_active,
             'created_at': section.created_at.isoformat() if section.created_at else None,
-            'course': {
-                'id': section.course_id,
-                'name': course_name,
-                'category': course_category,
-                'is_active': True
-            }
+            'course': course_object
         })
 
-    return jsonify({'sections': sections_data}), 200
+    return json_response({'sections': sections_data})
 
 @courses_bp.route('/<int:course_id>/sections', methods=['POST'])
 @jwt_required()
+@admin_required
 def create_course_section(course_id):
     """Create a new section for a course (Admin only)"""
-    current_user_id = int(get_jwt_identity())
-    user = User.query.get(current_user_id)
-    
-    if not user or user.role != 'admin':
-        return jsonify({'message': 'Admin access required'}), 403
-    
     course = Course.query.get_or_404(course_id)
     
     data = request.get_json()
@@ -800,6 +1065,7 @@ def create_course_section(course_id):
     
     db.session.add(new_section)
     db.session.commit()
+    clear_view_cache()
     
     return jsonify({
         'message': 'Course section created successfully',
@@ -808,8 +1074,8 @@ def create_course_section(course_id):
             'course_id': new_section.course_id,
             'section_name': new_section.name,
             'schedule': new_section.schedule,
-            'start_date': new_section.start_time.strftime('%H:%M') if new_section.start_time else None,
-            'end_date': new_section.end_time.strftime('%H:%M') if new_section.end_time else None,
+            'start_date': _hm(new_section.start_time),
+            'end_date': _hm(new_section.end_time),
             'max_students': new_section.max_students,
             'current_students': new_section.current_students,
             'is_active': new_section.is_active,
@@ -819,14 +1085,9 @@ def create_course_section(course_id):
 
 @courses_bp.route('/sections/<int:section_id>', methods=['PUT'])
 @jwt_required()
+@admin_required
 def update_course_section(section_id):
     """Update a course section (Admin only)"""
-    current_user_id = int(get_jwt_identity())
-    user = User.query.get(current_user_id)
-    
-    if not user or user.role != 'admin':
-        return jsonify({'message': 'Admin access required'}), 403
-    
     section = Class.query.get_or_404(section_id)
     
     data = request.get_json()
@@ -840,33 +1101,24 @@ def update_course_section(section_id):
         if data['schedule'] == 'TBD':
             # Set to sentinel values for TBD schedules
             section.day_of_week = -1  # Use -1 to indicate TBD
-            section.start_time = datetime.strptime('00:00', '%H:%M').time()
-            section.end_time = datetime.strptime('00:00', '%H:%M').time()
+            section.start_time = dt_time(0, 0)
+            section.end_time = dt_time(0, 0)
         else:
-            schedule_parts = data['schedule'].split(' ')
-            if len(schedule_parts) >= 2:
-                day_name = schedule_parts[0]
-                time_range = schedule_parts[1]
-                
+            parsed = SCHEDULE_RE.match(data['schedule'])
+            if parsed:
                 # Map day name to day_of_week integer (backend: 0=Monday, 6=Sunday)
-                days_map = {
-                    'Monday': 0, 'Tuesday': 1, 'Wednesday': 2, 'Thursday': 3,
-                    'Friday': 4, 'Saturday': 5, 'Sunday': 6,
-                    'Mon': 0, 'Tue': 1, 'Wed': 2, 'Thu': 3,
-                    'Fri': 4, 'Sat': 5, 'Sun': 6
-                }
-                
-                if day_name in days_map:
-                    section.day_of_week = days_map[day_name]
+                day_of_week = DAYS_MAP.get(parsed.group(1))
+                if day_of_week is not None:
+                    section.day_of_week = day_of_week
                 
-                # Parse time range
-                if '-' in time_range:
-                    start_time_str, end_time_str = time_range.split('-')
+                # Time range
+                if parsed.group(2) is not None:
+                    start_h, start_m, end_h, end_m = map(int, parsed.group(2, 3, 4, 5))
                     try:
-                        section.start_time = datetime.strptime(start_time_str, '%H:%M').time()
-                        section.end_time = datetime.strptime(end_time_str, '%H:%M').time()
+                        section.start_time = dt_time(start_h, start_m)
+                        section.end_time = dt_time(end_h, end_m)
                     except ValueError:
-                        pass  # Keep existing times if parsing fails
+                        pass  # Keep existing times if they are out of range
     
     # Handle direct field updates
     if 'day_of_week' in data:
@@ -874,7 +1126,7 @@ def update_course_section(section_id):
     if 'start_time' in data:
         if isinstance(data['start_time'], str):
             try:
-                section.start_time = datetime.strptime(data['start_time'], '%H:%M').time()
+                section.start_time = _parse_hm(data['start_time'])
             except ValueError:
                 pass
         else:
@@ -882,7 +1134,7 @@ def update_course_section(section_id):
     if 'end_time' in data:
         if isinstance(data['end_time'], str):
             try:
-                section.end_time = datetime.strptime(data['end_time'], '%H:%M').time()
+                section.end_time = _parse_hm(data['end_time'])
             except ValueError:
                 pass
         else:
@@ -893,6 +1145,7 @@ def update_course_section(section_id):
         section.is_active = data['is_active']
     
     db.session.commit()
+    clear_view_cache()
     
     return jsonify({
         'message': 'Course section updated successfully',
@@ -912,41 +1165,38 @@ def update_course_section(section_id):
 
 @courses_bp.route('/sections/<int:section_id>', methods=['DELETE'])
 @jwt_required()
+@admin_required
 def delete_course_section(section_id):
     """Delete a course section (Admin only)"""
-    current_user_id = int(get_jwt_identity())
-    user = User.query.get(current_user_id)
-    
-    if not user or user.role != 'admin':
-        return jsonify({'message': 'Admin access required'}), 403
-    
     force = request.args.get('force', 'false').lower() == 'true'
     section = Class.query.get_or_404(section_id)
     
     if not force:
         # Check if there are enrollments in this section
-        enrollments = Enrollment.query.filter_by(class_id=section_id).count()
+        enrollments = _count(Enrollment, class_id=section_id)
         if enrollments > 0:
             return jsonify({'message': 'Cannot delete section with active enrollments'}), 400
-    else:
-        # Force delete: Delete all enrollments and attendance records first
-        try:
-            # Delete attendance records for this section
-            attendance_records = Attendance.query.filter_by(class_id=section_id).all()
-            for attendance in attendance_records:
-                db.session.delete(attendance)
-            
-            # Delete enrollments for this section
-            enrollments = Enrollment.query.filter_by(class_id=section_id).all()
-            for enrollment in enrollments:
-                db.session.delete(enrollment)
-            
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'message': f'Error deleting related records: {str(e)}'}), 500
-    
-    db.session.delete(section)
-    db.session.commit()
+
+        # Attendance rows cascade with the section; keep the attendance and payment
+        # history unless the delete is forced
+        if _count(Attendance, class_id=section_id) > 0:
+            return jsonify({'message': 'Cannot delete section with attendance records'}), 409
+
+    try:
+        if force:
+            # Force delete: attendance records and enrollments go first, as bulk
+            # DELETEs that never load the rows into the session
+            db.session.execute(delete(Attendance).where(Attendance.class_id == section_id))
+            db.session.execute(delete(Enrollment).where(Enrollment.class_id == section_id))
+
+        # A plain DELETE for the section too, committed together with the above
+        db.session.execute(delete(Class).where(Class.id == section_id))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error deleting course section: {str(e)}'}), 500
+
+    clear_view_cache()
     
     return jsonify({'message': 'Course section deleted successfully'}), 200
 
@@ -957,45 +1207,45 @@ def enroll_in_section(section_id):
     current_user_id = int(get_jwt_identity())
     user = User.query.get(current_user_id)
 
-    section = Class.query.get_or_404(section_id)
+    # Lock the section row so concurrent enrollments into it are checked one at a time
+    section = Class.query.filter_by(id=section_id).with_for_update().first_or_404()
     course = section.course
 
     # Check if section is active
     if not section.is_active:
         return jsonify({'message': 'Section is not active'}), 400
 
-    # Check if section is full
-    enrollment_count = Enrollment.query.filter_by(class_id=section_id, is_active=True).count()
-    if enrollment_count >= section.max_students:
-        return jsonify({'message': 'Section is full'}), 400
-
     # Get the student for this user (assuming user has students)
     # For now, we'll use the first student or create logic to handle this properly
     student = Student.query.filter_by(parent_id=user.parents[0].id).first() if user.parents else None
     if not student:
         return jsonify({'message': 'No student found for this user'}), 400
 
-    # Check if student is already enrolled in this section
-    existing_enrollment = Enrollment.query.filter_by(
-        student_id=student.id,
-        class_id=section_id,
-        is_active=True
-    ).first()
+    # Section load, this student's enrollment in the section and in any section of
+    # the same course, all from one pass over the relevant active enrollments. A
+    # locking read, so the count includes enrollments committed while we waited.
+    own_enrollment = Enrollment.student_id == student.id
+    enrollment_count, in_section, in_course = db.session.query(
+        func.count(case((Enrollment.class_id == section_id, 1))),
+        func.count(case((and_(own_enrollment, Enrollment.class_id == section_id), 1))),
+        func.count(case((and_(own_enrollment, Class.course_id == section.course_id), 1)))
+    ).select_from(Enrollment).join(
+        Class, Enrollment.class_id == Class.id
+    ).filter(
+        Enrollment.is_active == True,
+        or_(Enrollment.class_id == section_id, own_enrollment)
+    ).with_for_update(read=True).one()
 
-    if existing_enrollment:
+    # Check if section is full
+    if enrollment_count >= section.max_students:
+        return jsonify({'message': 'Section is full'}), 400
+
+    # Check if student is already enrolled in this section
+    if in_section:
         return jsonify({'message': 'Already enrolled in this section'}), 400
 
     # Check if student is already enrolled in another section of the same course
-    course_sections = Class.query.filter_by(course_id=section.course_id).all()
-    section_ids = [s.id for s in course_sections]
-
-    existing_course_enrollment = Enrollment.query.filter(
-        Enrollment.student_id == student.id,
-        Enrollment.class_id.in_(section_ids),
-        Enrollment.is_active == True
-    ).first()
-
-    if existing_course_enrollment:
+    if in_course:
         return jsonify({'message': 'Already enrolled in another section of this course'}), 400
 
     # Create enrollment with payment type from course
@@ -1009,6 +1259,7 @@ def enroll_in_section(section_id):
 
     db.session.add(enrollment)
     db.session.commit()
+    clear_view_cache()
 
     return jsonify({
         'message': 'Successfully enrolled in section',
@@ -1027,19 +1278,19 @@ def unenroll_from_section(section_id):
     """Unenroll user from a course section"""
     current_user_id = int(get_jwt_identity())
     
-    enrollment = Enrollment.query.filter_by(
+    # Deactivate in a single UPDATE; the matched row count tells us whether it existed.
+    # Section student counts are computed from active enrollments, nothing to decrement.
+    updated = Enrollment.query.filter_by(
         student_id=current_user_id, 
         class_id=section_id,
         is_active=True
-    ).first_or_404()
-    
-    section = Class.query.get(section_id)
+    ).update({'is_active': False}, synchronize_session=False)
     
-    # Update section student count is handled by the available_seats property
-    # No need to manually decrement current_students
+    if not updated:
+        abort(404)
     
-    enrollment.is_active = False
     db.session.commit()
+    clear_view_cache()
     
     return jsonify({'message': 'Successfully unenrolled from section'}), 200
 
@@ -1049,29 +1300,37 @@ def get_user_enrollments():
     """Get user's course section enrollments"""
     current_user_id = int(get_jwt_identity())
     
-    # Get all enrollments (including pending) through student relationship - find students that belong to parents of this user
-    enrollments = Enrollment.query.join(Student).join(Parent).filter(Parent.user_id == current_user_id).all()
+    # Get all enrollments (including pending) through student relationship - find students that belong to parents of this user.
+    # Sections are batch-loaded together with their course instead of two lazy loads per row.
+    enrollments = Enrollment.query.options(
+        selectinload(Enrollment.class_).joinedload(Class.course)
+    ).join(Student).join(Parent).filter(Parent.user_id == current_user_id).all()
+
+    # Active enrollment counts for all of these sections in one grouped query
+    # (Class.current_students would issue a COUNT per row)
+    section_ids = {enrollment.class_id for enrollment in enrollments}
+    current_students = dict(db.session.query(
+        Enrollment.class_id, func.count(Enrollment.id)
+    ).filter(
+        Enrollment.class_id.in_(section_ids),
+        Enrollment.is_active == True
+    ).group_by(Enrollment.class_id).all()) if section_ids else {}
     
+    # Siblings enrolled in the same course share one course object, and
+    # siblings in the same section share one schedule string
+    course_objects = {}
+    schedules = {}
+
     enrollments_data = []
     for enrollment in enrollments:
         section = enrollment.class_
         course = section.course
-        
-        enrollments_data.append({
-            'enrollment_id': enrollment.id,
-            'section': {
-                'id': section.id,
-                'course_id': section.course_id,
-                'section_name': section.name,
-                'schedule': section.schedule,
-                'start_date': section.start_time.strftime('%H:%M') if section.start_time else None,
-                'end_date': section.end_time.strftime('%H:%M') if section.end_time else None,
-                'max_students': section.max_students,
-                'current_students': section.current_students,
-                'is_active': section.is_active,
-                'created_at': section.created_at.isoformat() if section.created_at else None
-            },
-            'course': {
+        schedule = schedules.get(section.id)
+        if schedule is None:
+            schedule = schedules[section.id] = section.schedule
+        course_object = course_objects.get(course.id)
+        if course_object is None:
+            course_object = course_objects[course.id] = {
                 'id': course.id,
                 'name': course.name,
                 'name_en': course.name_en,
@@ -1086,7 +1345,23 @@ def get_user_enrollments():
                 'session_price': float(course.session_price) if course.session_price else None,
                 'monthly_price': float(course.monthly_price) if course.monthly_price else None,
                 'session_duration_hours': course.session_duration
+            }
+        
+        enrollments_data.append({
+            'enrollment_id': enrollment.id,
+            'section': {
+                'id': section.id,
+                'course_id': section.course_id,
+                'section_name': section.name,
+                'schedule': schedule,
+                'start_date': _hm(section.start_time),
+                'end_date': _hm(section.end_time),
+                'max_students': section.max_students,
+                'current_students': current_students.get(section.id, 0),
+                'is_active': section.is_active,
+                'created_at': section.created_at.isoformat() if section.created_at else None
             },
+            'course': course_object,
             'enrollment_date': enrollment.enrollment_date.isoformat(),
             'enrollment_status': enrollment.status,
             'is_active': enrollment.is_active,
@@ -1097,22 +1372,31 @@ def get_user_enrollments():
             'sessions_this_month': enrollment.monthly_sessions_attended
         })
     
-    return jsonify({'enrollments': enrollments_data}), 200
+    return json_response({'enrollments': enrollments_data})
 
 @courses_bp.route('/<int:course_id>/generate-qr', methods=['POST'])
 @jwt_required()
+@admin_required
 def generate_course_qr(course_id):
-    """Generate QR code for course attendance"""
-    current_user_id = int(get_jwt_identity())
-    user = User.query.get(current_user_id)
-    
-    if not user or user.role != 'admin':
-        return jsonify({'message': 'Admin access required'}), 403
-    
+    """Generate QR code for course attendance (?force=true always issues a new one)"""
     course = Course.query.get_or_404(course_id)
+    force = request.args.get('force', 'false').lower() == 'true'
+    
+    # Reuse the current QR code unless it expires within the next hour or encodes
+    # an outdated course name
+    course_key = _qr_course_key(course)
+    if not force and course.qr_code_data and course.qr_code_expires and \
+            course.qr_code_expires > datetime.utcnow() + timedelta(hours=1) and \
+            _stored_qr_course_key(course.qr_code_data) == course_key:
+        return jsonify({
+            'message': 'QR code generated successfully',
+            'qr_code_data': course.qr_code_data,
+            'expires_at': course.qr_code_expires.isoformat()
+        }), 200
     
     # Generate QR code data
-    qr_data = f"COURSE:{course.id}|NAME:{course.name}|TIMESTAMP:{datetime.utcnow().isoformat()}"
+    issued_at = datetime.utcnow()
+    qr_data = f"{course_key}|TIMESTAMP:{issued_at.isoformat()}"
     
     # Create QR code
     qr = qrcode.QRCode(
@@ -1127,14 +1411,17 @@ def generate_course_qr(course_id):
     # Create QR code image
     img = qr.make_image(fill_color="black", back_color="white")
     
-    # Convert to base64
+    # Convert to base64 (fast zlib level: a two-colour QR barely shrinks at higher levels),
+    # recording the course key for the reuse check above
+    png_info = PngInfo()
+    png_info.add_text(QR_PAYLOAD_PNG_KEY, course_key)
     buffered = BytesIO()
-    img.save(buffered, format="PNG")
+    img.save(buffered, format="PNG", compress_level=1, pnginfo=png_info)
     qr_code_base64 = base64.b64encode(buffered.getvalue()).decode()
     
     # Update course with QR code data and expiration
     course.qr_code_data = qr_code_base64
-    course.qr_code_expires = datetime.utcnow() + timedelta(hours=24)  # QR valid for 24 hours
+    course.qr_code_expires = issued_at + QR_CODE_LIFETIME
     
     db.session.commit()
     
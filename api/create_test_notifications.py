@@ -53,29 +53,23 @@ with app.app_context():
         }
     ]
     
-    created_count = 0
-    for notif_data in test_notifications:
-        notification = Notification(
-            user_id=user.id,
-            title_en=notif_data['title_en'],
-            title_ar=notif_data['title_ar'],
-            message_en=notif_data['message_en'],
-            message_ar=notif_data['message_ar'],
-            type=notif_data['type'],
-            is_read=False,
-            created_at=datetime.utcnow()
-        )
-        db.session.add(notification)
-        created_count += 1
-        
-        print(f"\n📬 Created notification #{created_count}:")
-        print(f"   EN: {notif_data['title_en']}")
-        print(f"   AR: {notif_data['title_ar']}")
-        print(f"   Type: {notif_data['type']}")
+    # Rows go in as one bulk INSERT instead of one ORM object per notification
+    created_at = datetime.utcnow()
+    rows = [
+        dict(notif_data, user_id=user.id, is_read=False, created_at=created_at)
+        for notif_data in test_notifications
+    ]
+    db.session.bulk_insert_mappings(Notification, rows)
+    
+    for number, row in enumerate(rows, 1):
+        print(f"\n📬 Created notification #{number}:")
+        print(f"   EN: {row['title_en']}")
+        print(f"   AR: {row['title_ar']}")
+        print(f"   Type: {row['type']}")
     
     db.session.commit()
     
-    print(f"\n✅ Successfully created {created_count} bilingual notifications!")
+    print(f"\n✅ Successfully created {len(rows)} bilingual notifications!")
     print(f"\n🔍 To test in mobile app:")
     print(f"   1. Login as: {user.full_name}")
     print(f"   2. Navigate to Notifications screen")
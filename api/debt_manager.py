@@ -4,13 +4,19 @@ Handles all debt tracking operations to ensure consistency between GUI and API
 """
 from decimal import Decimal
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import func, update
+from sqlalchemy.orm import joinedload
 from models import db, Student, Attendance, Enrollment, Payment, Notification
 from utils import get_algerian_time
+from push_notifications import PushNotificationService
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Students are read, reconciled and written back in pages of this size when
+# reconciling all debts
+RECONCILE_BATCH_SIZE = 500
+
 
 class DebtManager:
     """Centralized debt management to ensure consistent financial tracking"""
@@ -30,31 +36,39 @@ class DebtManager:
             dict: Operation result with success status and new debt total
         """
         try:
-            student = Student.query.get(student_id)
-            if not student:
+            amount = Decimal(str(amount))
+            
+            # Increment in SQL so concurrent debt changes can't overwrite each other;
+            # 'fetch' expires total_debt on a Student the session already holds, so a
+            # later flush of it can't write the old total back
+            updated = Student.query.filter(Student.id == student_id).update(
+                {Student.total_debt: func.coalesce(Student.total_debt, 0) + amount},
+                synchronize_session='fetch'
+            )
+            if not updated:
                 return {'success': False, 'error': 'Student not found'}
             
-            amount = Decimal(str(amount))
-            old_debt = student.total_debt or Decimal('0')
-            student.total_debt = old_debt + amount
+            # The row stays locked by the UPDATE until commit, so this is our own total
+            new_debt = db.session.query(Student.total_debt).filter(Student.id == student_id).scalar()
+            old_debt = new_debt - amount
             
             # Update attendance payment status if provided
             if attendance_id:
-                attendance = Attendance.query.get(attendance_id)
-                if attendance:
-                    attendance.payment_status = 'unpaid'
-                    attendance.payment_amount = float(amount)
+                Attendance.query.filter(Attendance.id == attendance_id).update(
+                    {'payment_status': 'unpaid', 'payment_amount': amount},
+                    synchronize_session='fetch'
+                )
             
             if commit:
                 db.session.commit()
             
             logger.info(f"Added debt: Student {student_id}, Amount {amount}, "
-                       f"Old debt: {old_debt}, New debt: {student.total_debt}")
+                       f"Old debt: {old_debt}, New debt: {new_debt}")
             
             return {
                 'success': True,
                 'old_debt': float(old_debt),
-                'new_debt': float(student.total_debt),
+                'new_debt': float(new_debt),
                 'amount_added': float(amount)
             }
             
@@ -84,48 +98,68 @@ class DebtManager:
             dict: Operation result with details
         """
         try:
-            student = Student.query.get(student_id)
-            if not student:
-                return {'success': False, 'error': 'Student not found'}
-            
             amount = Decimal(str(amount))
-            old_debt = student.total_debt or Decimal('0')
             
-            # Validate amount doesn't exceed debt
-            if amount > old_debt:
+            # Reduce student debt in SQL; the WHERE clause is the "amount doesn't
+            # exceed debt" check, so it can't race with another payment ('fetch'
+            # refreshes a Student the session already holds)
+            updated = Student.query.filter(
+                Student.id == student_id,
+                Student.total_debt >= amount
+            ).update({Student.total_debt: Student.total_debt - amount}, synchronize_session='fetch')
+            
+            if not updated:
+                row = db.session.query(Student.total_debt).filter(Student.id == student_id).first()
+                if row is None:
+                    return {'success': False, 'error': 'Student not found'}
+                
+                # Validate amount doesn't exceed debt
                 return {
                     'success': False, 
-                    'error': f'Payment amount {amount} exceeds outstanding debt {old_debt}'
+                    'error': f'Payment amount {amount} exceeds outstanding debt {row[0] or Decimal("0")}'
                 }
             
-            # Reduce student debt
-            student.total_debt = max(Decimal('0'), old_debt - amount)
+            # The row stays locked by the UPDATE until commit, so this is our own total
+            new_debt = db.session.query(Student.total_debt).filter(Student.id == student_id).scalar()
+            old_debt = new_debt + amount
             
             # Mark attendances as paid
             marked_attendances = []
             if attendance_ids:
-                # Mark specific attendances
-                for att_id in attendance_ids:
-                    attendance = Attendance.query.get(att_id)
-                    if attendance and attendance.payment_status == 'unpaid':
-                        attendance.payment_status = 'paid'
-                        marked_attendances.append(att_id)
+                # Mark specific attendances (the unpaid ones among them, fetched in one query)
+                unpaid_attendances = Attendance.query.filter(
+                    Attendance.id.in_(attendance_ids),
+                    Attendance.payment_status == 'unpaid'
+                ).all()
+                for attendance in unpaid_attendances:
+                    attendance.payment_status = 'paid'
+                    marked_attendances.append(attendance.id)
             else:
-                # Auto-select oldest unpaid attendances
+                # Auto-select oldest unpaid attendances (payment_amount is a Numeric
+                # column, so the amounts already come back as Decimal)
                 remaining_amount = amount
-                unpaid_attendances = Attendance.query.filter_by(
+                unpaid_attendances = db.session.query(
+                    Attendance.id, Attendance.payment_amount
+                ).filter_by(
                     student_id=student_id,
                     payment_status='unpaid'
                 ).order_by(Attendance.attendance_date).all()
                 
-                for attendance in unpaid_attendances:
+                for att_id, att_amount in unpaid_attendances:
                     if remaining_amount <= 0:
                         break
-                    att_amount = Decimal(str(attendance.payment_amount or 0))
+                    att_amount = att_amount or Decimal('0')
                     if att_amount <= remaining_amount:
-                        attendance.payment_status = 'paid'
-                        marked_attendances.append(attendance.id)
+                        marked_attendances.append(att_id)
                         remaining_amount -= att_amount
+                
+                if marked_attendances:
+                    db.session.execute(
+                        update(Attendance)
+                        .where(Attendance.id.in_(marked_attendances))
+                        .values(payment_status='paid')
+                        .execution_options(synchronize_session='fetch')
+                    )
             
             # Create payment record
             payment_id = None
@@ -143,25 +177,25 @@ class DebtManager:
                 db.session.flush()  # Get payment ID
                 payment_id = payment.id
             
-            # Create bilingual notification
-            from push_notifications import PushNotificationService
+            if commit:
+                db.session.commit()
+            
+            # Create bilingual notification (after the commit, so a slow push
+            # service doesn't hold the student's row lock)
             PushNotificationService.send_payment_confirmation_notification(
                 student_id=student_id,
                 amount=float(amount),
                 payment_method=payment_method
             )
             
-            if commit:
-                db.session.commit()
-            
             logger.info(f"Cleared debt: Student {student_id}, Amount {amount}, "
-                       f"Old debt: {old_debt}, New debt: {student.total_debt}, "
+                       f"Old debt: {old_debt}, New debt: {new_debt}, "
                        f"Attendances marked: {len(marked_attendances)}")
             
             return {
                 'success': True,
                 'old_debt': float(old_debt),
-                'new_debt': float(student.total_debt),
+                'new_debt': float(new_debt),
                 'amount_paid': float(amount),
                 'attendances_marked': marked_attendances,
                 'payment_id': payment_id
@@ -186,35 +220,28 @@ class DebtManager:
             float or dict: Total debt, or detailed breakdown if include_details=True
         """
         try:
-            student = Student.query.get(student_id)
-            if not student:
+            # Only the stored debt is needed, not a full Student object
+            row = db.session.query(Student.total_debt).filter(Student.id == student_id).first()
+            if row is None:
                 return 0.0 if not include_details else {'total_debt': 0.0, 'error': 'Student not found'}
             
             # Get stored debt
-            stored_debt = float(student.total_debt or 0)
-            
-            # Calculate actual debt from unpaid attendances
-            calculated_debt = db.session.query(
-                func.coalesce(func.sum(Attendance.payment_amount), 0)
-            ).filter(
-                Attendance.student_id == student_id,
-                Attendance.payment_status == 'unpaid',
-                Attendance.status == 'present'  # Only count present attendances
-            ).scalar() or 0
-            
-            calculated_debt = float(calculated_debt)
+            stored_debt = float(row[0] or 0)
             
             if not include_details:
                 # Return stored debt (should match calculated)
                 return stored_debt
             
-            # Get unpaid attendance details
+            # Get unpaid attendance details (only present attendances count)
             unpaid_attendances = Attendance.query.filter_by(
                 student_id=student_id,
                 payment_status='unpaid',
                 status='present'
             ).order_by(Attendance.attendance_date).all()
             
+            # Calculate actual debt from the same rows
+            calculated_debt = float(sum(att.payment_amount or 0 for att in unpaid_attendances))
+            
             attendance_details = [{
                 'id': att.id,
                 'date': att.attendance_date.isoformat() if att.attendance_date else None,
@@ -292,33 +319,84 @@ class DebtManager:
                 db.session.rollback()
             return {'success': False, 'error': str(e)}
     
+    @staticmethod
+    def get_calculated_debts(student_ids):
+        """
+        Calculate the given students' debts from unpaid attendances in one grouped query
+        
+        Args:
+            student_ids: Student IDs to calculate
+        
+        Returns:
+            dict: {student_id: calculated debt}; students without unpaid sessions are absent
+        """
+        return dict(db.session.query(
+            Attendance.student_id,
+            func.coalesce(func.sum(Attendance.payment_amount), 0)
+        ).filter(
+            Attendance.student_id.in_(student_ids),
+            Attendance.payment_status == 'unpaid',
+            Attendance.status == 'present'
+        ).group_by(Attendance.student_id).all())
+    
     @staticmethod
     def reconcile_all_debts():
         """
         Reconcile debts for all students
         
         Returns:
-            dict: Summary of reconciliation operation
+            dict: Summary of reconciliation operation; details lists the corrected students only
         """
         try:
-            students = Student.query.all()
             results = []
+            total_students = 0
             corrected_count = 0
-            
-            for student in students:
-                result = DebtManager.reconcile_student_debt(student.id, commit=False)
-                if result.get('success') and result.get('was_corrected'):
-                    corrected_count += 1
-                results.append(result)
+            last_id = 0
+            
+            # Keyset pages of students: each page's debts are summed for just its ids
+            # and its changed rows written before the next page is read, so memory
+            # stays bounded by the page size (plus the corrected students reported)
+            while True:
+                students = db.session.query(Student.id, Student.total_debt).filter(
+                    Student.id > last_id
+                ).order_by(Student.id).limit(RECONCILE_BATCH_SIZE).all()
+                if not students:
+                    break
+                last_id = students[-1][0]
+                
+                calculated_debts = DebtManager.get_calculated_debts([row[0] for row in students])
+                updates = []
+                for student_id, total_debt in students:
+                    total_students += 1
+                    old_debt = float(total_debt or 0)
+                    calculated_debt = Decimal(str(calculated_debts.get(student_id, 0)))
+                    if calculated_debt != (total_debt or 0):
+                        updates.append({'id': student_id, 'total_debt': calculated_debt})
+                    
+                    discrepancy = float(calculated_debt) - old_debt
+                    if abs(discrepancy) > 0.01:
+                        corrected_count += 1
+                        results.append({
+                            'success': True,
+                            'student_id': student_id,
+                            'old_debt': old_debt,
+                            'new_debt': float(calculated_debt),
+                            'discrepancy': discrepancy,
+                            'was_corrected': True
+                        })
+                
+                # Only students whose stored debt differs are written, one batched UPDATE per page
+                if updates:
+                    db.session.bulk_update_mappings(Student, updates)
             
             db.session.commit()
             
-            logger.info(f"Reconciled all debts: {len(students)} students, "
+            logger.info(f"Reconciled all debts: {total_students} students, "
                        f"{corrected_count} corrections made")
             
             return {
                 'success': True,
-                'total_students': len(students),
+                'total_students': total_students,
                 'corrections_made': corrected_count,
                 'details': results
             }
@@ -340,26 +418,23 @@ class DebtManager:
             dict: Debt summary for this enrollment
         """
         try:
-            enrollment = Enrollment.query.get(enrollment_id)
+            # The student's total_debt comes back with the enrollment row
+            enrollment = Enrollment.query.options(
+                joinedload(Enrollment.student).load_only(Student.total_debt)
+            ).get(enrollment_id)
             if not enrollment:
                 return {'success': False, 'error': 'Enrollment not found'}
             
-            # Get unpaid attendances for this enrollment
-            unpaid_amount = db.session.query(
-                func.coalesce(func.sum(Attendance.payment_amount), 0)
+            # Get unpaid attendances for this enrollment (amount and count in one query)
+            unpaid_amount, unpaid_count = db.session.query(
+                func.coalesce(func.sum(Attendance.payment_amount), 0),
+                func.count(Attendance.id)
             ).filter(
                 Attendance.student_id == enrollment.student_id,
                 Attendance.class_id == enrollment.class_id,
                 Attendance.payment_status == 'unpaid',
                 Attendance.status == 'present'
-            ).scalar() or 0
-            
-            unpaid_count = Attendance.query.filter_by(
-                student_id=enrollment.student_id,
-                class_id=enrollment.class_id,
-                payment_status='unpaid',
-                status='present'
-            ).count()
+            ).one()
             
             return {
                 'success': True,
@@ -6,6 +6,43 @@ db = SQLAlchemy()
 
 # Phone number validation regex
 PHONE_REGEX = r'^0(5|6|7)\d{8}$'
+PHONE_PATTERN = re.compile(PHONE_REGEX)
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Abbreviated day names for schedule strings, indexed by day_of_week (Monday=0, Sunday=6)
+SCHEDULE_DAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+def format_class_schedule(day_of_week, start_time, end_time, multi_day_schedule=None):
+    """Schedule string for a class from its raw column values (see Class.schedule)
+
+    Kept as a plain function so listings that select columns instead of Class
+    instances produce the same string.
+    """
+    days = SCHEDULE_DAY_NAMES
+    
+    # Handle kindergarten multi-day schedules. These are always stored as a JSON
+    # list of day integers such as "[0,2,4]", so they are split directly rather
+    # than going through json.loads for every class rendered.
+    if multi_day_schedule:
+        try:
+            days_list = [int(day) for day in multi_day_schedule.strip('[] ').split(',')]
+        except (ValueError, TypeError, AttributeError):
+            days_list = []
+        day_names = [days[day_idx] for day_idx in days_list if 0 <= day_idx < len(days)]
+        
+        if day_names:
+            start_str = start_time.strftime('%H:%M') if start_time else '00:00'
+            end_str = end_time.strftime('%H:%M') if end_time else '00:00'
+            days_str = '/'.join(day_names)
+            return f"{days_str} {start_str}-{end_str}"
+    
+    # Handle regular single-day schedules
+    if day_of_week is not None and day_of_week != -1 and start_time and end_time:
+        day_name = days[day_of_week] if 0 <= day_of_week < len(days) else 'Unknown'
+        start_str = start_time.strftime('%H:%M')
+        end_str = end_time.strftime('%H:%M')
+        return f"{day_name} {start_str}-{end_str}"
+    return 'TBD'
 
 # Database Models
 class User(db.Model):
@@ -63,10 +100,13 @@ class Parent(db.Model):
 
 class Student(db.Model):
     __tablename__ = 'students'
+    __table_args__ = (
+        db.Index('ix_students_mobile_enabled', 'mobile_app_enabled', 'user_id'),  # Mobile-access lookups
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     parent_id = db.Column(db.Integer, db.ForeignKey('parents.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # For barcode login
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)  # For barcode login
     name = db.Column(db.String(100), nullable=True)  # Can be null after barcode login
     date_of_birth = db.Column(db.Date, nullable=True)  # Can be null after barcode login
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -90,11 +130,19 @@ class Student(db.Model):
     total_debt = db.Column(db.Numeric(10, 2), default=0.00, nullable=False)  # Total outstanding debt for this student
 
     # Relationships
+    user = db.relationship('User', foreign_keys=[user_id], backref=db.backref('student_records', lazy=True), lazy=True)
     enrollments = db.relationship('Enrollment', back_populates='student', lazy=True)
     attendances = db.relationship('Attendance', back_populates='student', lazy=True)
 
 class Course(db.Model):
     __tablename__ = 'courses'
+    __table_args__ = (
+        # Course search (MATCH ... AGAINST); ngram parser so Arabic names tokenize
+        db.Index('ix_courses_search', 'name', 'name_ar', 'name_en', 'description', 'description_ar', 'description_en',
+                 mysql_prefix='FULLTEXT', mysql_with_parser='ngram'),
+        db.Index('ix_courses_active_category', 'is_active', 'category'),  # Listing filtered by category
+        db.Index('ix_courses_active_pricing', 'is_active', 'pricing_type'),  # Listing filtered by pricing type
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
@@ -180,11 +228,14 @@ class Gallery(db.Model):
 
 class Registration(db.Model):
     __tablename__ = 'registrations'
+    __table_args__ = (
+        db.Index('ix_registrations_course_status', 'course_id', 'status'),  # Approved-seat counts
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     parent_id = db.Column(db.Integer, db.ForeignKey('parents.id'), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
     status = db.Column(db.Enum('pending', 'approved', 'rejected'), default='pending')
     payment_status = db.Column(db.Enum('unpaid', 'paid', 'partial'), default='unpaid')
@@ -200,7 +251,7 @@ class Class(db.Model):
     __tablename__ = 'classes'
 
     id = db.Column(db.Integer, primary_key=True)
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), nullable=False)
     name = db.Column(db.String(200), nullable=False)
     day_of_week = db.Column(db.Integer, nullable=True)  # 0=Monday, 6=Sunday. NULL for kindergarten multi-day classes
     start_time = db.Column(db.Time, nullable=False)
@@ -224,37 +275,7 @@ class Class(db.Model):
     @property
     def schedule(self):
         """Generate schedule string from day_of_week, start_time, end_time, or multi_day_schedule"""
-        import json
-        
-        # Handle kindergarten multi-day schedules
-        if self.multi_day_schedule:
-            try:
-                days_list = json.loads(self.multi_day_schedule)
-                if days_list and isinstance(days_list, list):
-                    # Use abbreviated day names to match backend mapping (Monday=0, Sunday=6)
-                    days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-                    day_names = []
-                    for day_idx in days_list:
-                        if isinstance(day_idx, int) and 0 <= day_idx < len(days):
-                            day_names.append(days[day_idx])
-                    
-                    if day_names:
-                        start_str = self.start_time.strftime('%H:%M') if self.start_time else '00:00'
-                        end_str = self.end_time.strftime('%H:%M') if self.end_time else '00:00'
-                        days_str = '/'.join(day_names)
-                        return f"{days_str} {start_str}-{end_str}"
-            except (json.JSONDecodeError, TypeError):
-                pass
-        
-        # Handle regular single-day schedules
-        if self.day_of_week is not None and self.day_of_week != -1 and self.start_time and self.end_time:
-            # Use abbreviated day names to match backend mapping (Monday=0, Sunday=6)
-            days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-            day_name = days[self.day_of_week] if 0 <= self.day_of_week < len(days) else 'Unknown'
-            start_str = self.start_time.strftime('%H:%M') if self.start_time else '00:00'
-            end_str = self.end_time.strftime('%H:%M') if self.end_time else '00:00'
-            return f"{day_name} {start_str}-{end_str}"
-        return 'TBD'
+        return format_class_schedule(self.day_of_week, self.start_time, self.end_time, self.multi_day_schedule)
 
     @property
     def current_students(self):
@@ -268,10 +289,14 @@ class Class(db.Model):
 
 class Enrollment(db.Model):
     __tablename__ = 'enrollments'
+    __table_args__ = (
+        db.Index('ix_enrollments_student_class', 'student_id', 'class_id', 'is_active'),  # Already-enrolled checks
+        db.Index('ix_enrollments_class_active', 'class_id', 'is_active'),  # Section capacity counts
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
-    class_id = db.Column(db.Integer, db.ForeignKey('classes.id'), nullable=False)
+    class_id = db.Column(db.Integer, db.ForeignKey('classes.id', ondelete='CASCADE'), nullable=False)
     enrollment_date = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     
@@ -396,10 +421,14 @@ class Enrollment(db.Model):
 
 class Attendance(db.Model):
     __tablename__ = 'attendances'
+    __table_args__ = (
+        # Unpaid-debt SUM/COUNT per student, served from the index alone
+        db.Index('ix_attendances_student_unpaid', 'student_id', 'payment_status', 'status', 'payment_amount'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
-    class_id = db.Column(db.Integer, db.ForeignKey('classes.id'), nullable=False)
+    class_id = db.Column(db.Integer, db.ForeignKey('classes.id', ondelete='CASCADE'), nullable=False)
     attendance_date = db.Column(db.Date, nullable=False)
     status = db.Column(db.Enum('present', 'absent', 'late'), default='present')
     marked_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -485,7 +514,7 @@ class CourseSection(db.Model):
     __tablename__ = 'course_sections'
 
     id = db.Column(db.Integer, primary_key=True)
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), nullable=False)
     section_name = db.Column(db.String(100), nullable=False)  # e.g., "Section 1", "Section 2"
     day_of_week = db.Column(db.Integer, nullable=False)  # 0=Monday, 6=Sunday
     start_time = db.Column(db.Time, nullable=False)
@@ -503,7 +532,7 @@ class SectionEnrollment(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
-    section_id = db.Column(db.Integer, db.ForeignKey('course_sections.id'), nullable=False)
+    section_id = db.Column(db.Integer, db.ForeignKey('course_sections.id', ondelete='CASCADE'), nullable=False)
     enrollment_date = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
 
@@ -730,7 +759,7 @@ def user_settings_to_dict(settings):
 
 # Validation functions
 def validate_phone(phone):
-    return re.match(PHONE_REGEX, phone) is not None
+    return PHONE_PATTERN.match(phone) is not None
 
 def validate_email(email):
-    return re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email) is not None
+    return EMAIL_PATTERN.match(email) is not None
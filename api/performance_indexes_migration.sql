@@ -0,0 +1,35 @@
+-- Migration: Indexes for hot query paths
+-- db.create_all() only creates indexes for new tables, so existing databases
+-- need these applied by hand. Re-running a statement for an index that already
+-- exists fails with "Duplicate key name" and can be ignored.
+
+-- Students with mobile access (mobile login, linkage diagnostics)
+CREATE INDEX ix_students_mobile_enabled ON students(mobile_app_enabled, user_id);
+
+-- Student lookup by linked user (barcode login, profile completion)
+CREATE INDEX ix_students_user_id ON students(user_id);
+
+-- Course search across names and descriptions (MATCH ... AGAINST); the ngram
+-- parser splits Arabic and other unsegmented text into searchable tokens
+CREATE FULLTEXT INDEX ix_courses_search
+    ON courses(name, name_ar, name_en, description, description_ar, description_en)
+    WITH PARSER ngram;
+
+-- Already-enrolled checks (student in any section of a course)
+CREATE INDEX ix_enrollments_student_class ON enrollments(student_id, class_id, is_active);
+
+-- Approved-registration counts per course (seat availability, delete guard)
+CREATE INDEX ix_registrations_course_status ON registrations(course_id, status);
+
+-- Active enrollment counts per section (capacity checks, section listings)
+CREATE INDEX ix_enrollments_class_active ON enrollments(class_id, is_active);
+
+-- Active-course listing filtered by category / pricing type. MySQL has no
+-- partial indexes, so is_active leads the key instead of a WHERE clause.
+CREATE INDEX ix_courses_active_category ON courses(is_active, category);
+CREATE INDEX ix_courses_active_pricing ON courses(is_active, pricing_type);
+
+-- Unpaid-debt totals per student (debt manager SUM/COUNT aggregates). MySQL has
+-- no INCLUDE columns, so payment_amount is the last key part to make the index
+-- covering for those queries.
+CREATE INDEX ix_attendances_student_unpaid ON attendances(student_id, payment_status, status, payment_amount);
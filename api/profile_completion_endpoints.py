@@ -1,4 +1,5 @@
 # Profile Completion Endpoints - To be added to auth.py
+# (relies on auth.py's module-level imports, including validate_phone from models)
 
 @auth_bp.route('/profile/check-completion', methods=['GET'])
 @jwt_required()
@@ -74,7 +75,6 @@ def check_profile_completion():
         
     except Exception as e:
         print(f"❌ [PROFILE_CHECK] Error: {str(e)}")
-        import traceback
         traceback.print_exc()
         return jsonify({'error': f'Failed to check profile completion: {str(e)}'}), 500
 
@@ -96,15 +96,16 @@ def complete_profile():
         if 'user_full_name' in data and data['user_full_name']:
             user.full_name = data['user_full_name'].strip()
         if 'user_email' in data and data['user_email']:
-            # Check if email already exists for another user
-            existing_user = User.query.filter_by(email=data['user_email']).first()
-            if existing_user and existing_user.id != user_id:
+            # Check if email already exists for another user (ids only, no User load)
+            email_taken = db.session.query(User.id).filter(
+                User.email == data['user_email'], User.id != user_id
+            ).first()
+            if email_taken:
                 return jsonify({'error': 'Email already in use by another account'}), 400
             user.email = data['user_email'].strip()
             user.email_verified = True
         if 'user_phone' in data and data['user_phone']:
             # Validate phone format
-            from auth import validate_phone
             if not validate_phone(data['user_phone']):
                 return jsonify({'error': 'Invalid phone number format'}), 400
             user.phone = data['user_phone'].strip()
@@ -117,7 +118,6 @@ def complete_profile():
             if 'parent_full_name' in data and data['parent_full_name']:
                 parent.full_name = data['parent_full_name'].strip()
             if 'parent_phone' in data and data['parent_phone']:
-                from auth import validate_phone
                 if not validate_phone(data['parent_phone']):
                     return jsonify({'error': 'Invalid parent phone number format'}), 400
                 parent.phone = data['parent_phone'].strip()
@@ -130,7 +130,6 @@ def complete_profile():
             if 'student_name' in data and data['student_name']:
                 student.name = data['student_name'].strip()
             if 'student_date_of_birth' in data and data['student_date_of_birth']:
-                from datetime import datetime
                 try:
                     # Parse date (format: YYYY-MM-DD)
                     student.date_of_birth = datetime.strptime(data['student_date_of_birth'], '%Y-%m-%d').date()
@@ -191,6 +190,5 @@ def complete_profile():
     except Exception as e:
         db.session.rollback()
         print(f"❌ [PROFILE_COMPLETE] Error: {str(e)}")
-        import traceback
         traceback.print_exc()
         return jsonify({'error': f'Failed to complete profile: {str(e)}'}), 500
@@ -19,6 +19,15 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Shared HTTP session for Expo push requests, so consecutive notifications
+# (bulk sends, student + parent pairs) reuse one keep-alive connection
+expo_session = requests.Session()
+expo_session.headers.update({
+    "Accept": "application/json",
+    "Accept-encoding": "gzip, deflate",
+    "Content-Type": "application/json",
+})
+
 # Translation dictionaries for common notification texts
 NOTIFICATION_TRANSLATIONS = {
     "en_to_ar": {
@@ -212,15 +221,8 @@ class PushNotificationService:
     def _send_expo_notification(payload):
         """Send notification via Expo Push Service"""
         try:
-            headers = {
-                "Accept": "application/json",
-                "Accept-encoding": "gzip, deflate",
-                "Content-Type": "application/json",
-            }
-            
-            response = requests.post(
+            response = expo_session.post(
                 PushNotificationService.EXPO_PUSH_URL,
-                headers=headers,
                 data=json.dumps(payload),
                 timeout=10
             )
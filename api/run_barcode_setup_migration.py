@@ -6,65 +6,89 @@ Run this script to apply the barcode setup migration
 from app import app, db
 from models import User
 
+# Columns added by this migration: (name, definition)
+BARCODE_SETUP_COLUMNS = (
+    ('barcode_setup_token', 'VARCHAR(255) NULL'),
+    ('barcode_setup_completed', 'BOOLEAN DEFAULT FALSE'),
+)
+
+BARCODE_SETUP_INDEX = 'idx_users_barcode_setup_token'
+
+# Users marked as completed per UPDATE/commit (ranges of primary key)
+UPDATE_CHUNK_SIZE = 10000
+
+def _existing_columns(conn):
+    """Column names currently on the users table"""
+    return set(conn.execute(db.text("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'users'
+    """)).scalars())
+
+def _index_exists(conn):
+    """Whether the barcode_setup_token index is already present"""
+    return conn.execute(db.text("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'users'
+          AND index_name = :index_name
+        LIMIT 1
+    """), {'index_name': BARCODE_SETUP_INDEX}).first() is not None
+
 def run_migration():
-    """Add barcode setup columns to users table"""
+    """Add barcode setup columns to users table
+
+    MySQL commits each ALTER TABLE / CREATE INDEX as it runs, so every schema
+    step is permanent on its own; the backfill of existing users commits per
+    UPDATE_CHUNK_SIZE id range. Re-running skips the steps already applied.
+    """
     with app.app_context():
         try:
             print("🔄 Starting barcode setup migration...")
             
-            # Add barcode_setup_token column
-            try:
-                db.session.execute(db.text("""
-                    ALTER TABLE users 
-                    ADD COLUMN barcode_setup_token VARCHAR(255) NULL
-                """))
-                db.session.commit()
-                print("✅ Added barcode_setup_token column")
-            except Exception as e:
-                db.session.rollback()
-                if "Duplicate column name" in str(e) or "already exists" in str(e):
-                    print("⚠️  barcode_setup_token column already exists")
-                else:
-                    raise
-            
-            # Add barcode_setup_completed column
-            try:
-                db.session.execute(db.text("""
-                    ALTER TABLE users 
-                    ADD COLUMN barcode_setup_completed BOOLEAN DEFAULT FALSE
-                """))
-                db.session.commit()
-                print("✅ Added barcode_setup_completed column")
-            except Exception as e:
-                db.session.rollback()
-                if "Duplicate column name" in str(e) or "already exists" in str(e):
-                    print("⚠️  barcode_setup_completed column already exists")
-                else:
-                    raise
-            
-            # Create index for performance
-            try:
-                db.session.execute(db.text("""
-                    CREATE INDEX idx_users_barcode_setup_token 
-                    ON users(barcode_setup_token)
-                """))
-                db.session.commit()
-                print("✅ Created index on barcode_setup_token")
-            except Exception as e:
-                db.session.rollback()
-                if "Duplicate key name" in str(e) or "already exists" in str(e):
+            # Existing columns/index are looked up first instead of catching
+            # "already exists" errors
+            with db.engine.connect() as conn:
+                existing = _existing_columns(conn)
+                missing = [(name, definition) for name, definition in BARCODE_SETUP_COLUMNS
+                           if name not in existing]
+                
+                for name, _ in BARCODE_SETUP_COLUMNS:
+                    if name in existing:
+                        print(f"⚠️  {name} column already exists")
+                
+                # Add the missing columns in a single ALTER (one table rebuild)
+                if missing:
+                    conn.execute(db.text(
+                        "ALTER TABLE users " +
+                        ", ".join(f"ADD COLUMN {name} {definition}" for name, definition in missing)
+                    ))
+                    for name, _ in missing:
+                        print(f"✅ Added {name} column")
+                
+                # Create index for performance
+                if _index_exists(conn):
                     print("⚠️  Index already exists")
                 else:
-                    raise
-            
-            # Update existing users to mark as completed
-            result = db.session.execute(db.text("""
-                UPDATE users 
-                SET barcode_setup_completed = TRUE 
-                WHERE barcode_setup_token IS NULL
-            """))
-            db.session.commit()
-            print(f"✅ Updated {result.rowcount} existing users to mark setup as completed")
+                    conn.execute(db.text(f"""
+                        CREATE INDEX {BARCODE_SETUP_INDEX} 
+                        ON users(barcode_setup_token)
+                    """))
+                    print("✅ Created index on barcode_setup_token")
+                
+                # Update existing users to mark as completed, one id range per
+                # transaction so row locks and undo stay bounded on large tables
+                min_id, max_id = conn.execute(db.text("SELECT MIN(id), MAX(id) FROM users")).one()
+                updated = 0
+                if max_id is not None:
+                    for lo in range(min_id, max_id + 1, UPDATE_CHUNK_SIZE):
+                        result = conn.execute(db.text("""
+                            UPDATE users 
+                            SET barcode_setup_completed = TRUE 
+                            WHERE id >= :lo AND id < :hi AND barcode_setup_token IS NULL
+                        """), {'lo': lo, 'hi': lo + UPDATE_CHUNK_SIZE})
+                        updated += result.rowcount
+                        conn.commit()
+                print(f"✅ Updated {updated} existing users to mark setup as completed")
+                conn.commit()
             
             print("\n🎉 Migration completed successfully!")
             print("\nNew columns added to users table:")
@@ -73,7 +97,6 @@ def run_migration():
             print("\nYou can now use the barcode setup login flow!")
             
         except Exception as e:
-            db.session.rollback()
             print(f"\n❌ Migration failed: {str(e)}")
             import traceback
             traceback.print_exc()
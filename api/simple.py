@@ -2,88 +2,58 @@
 Ultra-minimal Vercel entry point to avoid any class inspection issues
 """
 
+# Response headers, shared by every route. Kept as tuples and copied into a new
+# list per request: WSGI requires a list, and servers may append to it.
+JSON_HEADERS = (
+    ('Content-Type', 'application/json'),
+    ('Access-Control-Allow-Origin', '*')
+)
+TEST_HEADERS = JSON_HEADERS + (
+    ('Access-Control-Allow-Methods', 'GET, POST, OPTIONS'),
+    ('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+)
+
+# (substrings that must all appear in the path, response body), checked in order.
+# Bodies are encoded once here rather than on every request.
+ROUTES = (
+    # Health endpoint
+    (('health',), b'{"status": "healthy", "message": "API health check", "service": "Laws of Success Academy"}'),
+    # Courses filters specifically
+    (('courses', 'filters'), b'{"filters": {"levels": ["Beginner", "Intermediate", "Advanced"], "categories": ["Business", "Technology", "Personal Development"]}, "status": "success"}'),
+    # Other courses endpoints
+    (('courses',), b'{"courses": [], "message": "Courses endpoint working", "status": "success"}'),
+    # Auth endpoints
+    (('auth',), b'{"message": "Authentication endpoint", "status": "available"}'),
+    # Admin endpoints
+    (('admin',), b'{"message": "Admin endpoint", "status": "available"}'),
+    # Mobile endpoints
+    (('mobile',), b'{"message": "Mobile endpoint", "status": "available"}'),
+)
+
+# The test route echoes the request path into this template
+TEST_BODY = b'{"message": "API test working!", "status": "success", "path": "%b"}'
+
+DEFAULT_BODY = b'{"message": "Laws of Success Academy API", "status": "healthy", "version": "1.0.0", "endpoints": ["/api/test", "/api/health", "/api/courses"]}'
+
 def app(environ, start_response):
     """Ultra-minimal WSGI app - no imports, no classes"""
     
     path = environ.get('PATH_INFO', '/')
-    method = environ.get('REQUEST_METHOD', 'GET')
     
-    # Handle test endpoint
+    # Handle test endpoint (only the path itself is encoded per request)
     if 'test' in path:
-        body = '{"message": "API test working!", "status": "success", "path": "' + path + '"}'
-        status = '200 OK'
-        headers = [
-            ('Content-Type', 'application/json'),
-            ('Access-Control-Allow-Origin', '*'),
-            ('Access-Control-Allow-Methods', 'GET, POST, OPTIONS'),
-            ('Access-Control-Allow-Headers', 'Content-Type, Authorization')
-        ]
-    
-    # Handle health endpoint  
-    elif 'health' in path:
-        body = '{"status": "healthy", "message": "API health check", "service": "Laws of Success Academy"}'
-        status = '200 OK'
-        headers = [
-            ('Content-Type', 'application/json'),
-            ('Access-Control-Allow-Origin', '*')
-        ]
-    
-    # Handle courses filters specifically
-    elif 'courses' in path and 'filters' in path:
-        body = '{"filters": {"levels": ["Beginner", "Intermediate", "Advanced"], "categories": ["Business", "Technology", "Personal Development"]}, "status": "success"}'
-        status = '200 OK'
-        headers = [
-            ('Content-Type', 'application/json'),
-            ('Access-Control-Allow-Origin', '*')
-        ]
-    
-    # Handle other courses endpoints
-    elif 'courses' in path:
-        body = '{"courses": [], "message": "Courses endpoint working", "status": "success"}'
-        status = '200 OK'
-        headers = [
-            ('Content-Type', 'application/json'),
-            ('Access-Control-Allow-Origin', '*')
-        ]
-    
-    # Handle auth endpoints
-    elif 'auth' in path:
-        body = '{"message": "Authentication endpoint", "status": "available"}'
-        status = '200 OK'
-        headers = [
-            ('Content-Type', 'application/json'),
-            ('Access-Control-Allow-Origin', '*')
-        ]
-    
-    # Handle admin endpoints
-    elif 'admin' in path:
-        body = '{"message": "Admin endpoint", "status": "available"}'
-        status = '200 OK'
-        headers = [
-            ('Content-Type', 'application/json'),
-            ('Access-Control-Allow-Origin', '*')
-        ]
-    
-    # Handle mobile endpoints
-    elif 'mobile' in path:
-        body = '{"message": "Mobile endpoint", "status": "available"}'
-        status = '200 OK'
-        headers = [
-            ('Content-Type', 'application/json'),
-            ('Access-Control-Allow-Origin', '*')
-        ]
+        start_response('200 OK', list(TEST_HEADERS))
+        return [TEST_BODY % path.encode('utf-8')]
     
-    # Default response
+    for keys, body in ROUTES:
+        if all(key in path for key in keys):
+            break
     else:
-        body = '{"message": "Laws of Success Academy API", "status": "healthy", "version": "1.0.0", "endpoints": ["/api/test", "/api/health", "/api/courses"]}'
-        status = '200 OK'
-        headers = [
-            ('Content-Type', 'application/json'),
-            ('Access-Control-Allow-Origin', '*')
-        ]
+        # Default response
+        body = DEFAULT_BODY
     
-    start_response(status, headers)
-    return [body.encode('utf-8')]
+    start_response('200 OK', list(JSON_HEADERS))
+    return [body]
 
 # Export for Vercel
 application = app
@@ -0,0 +1,66 @@
+"""
+Course search regression test: Latin-script queries must return the same courses
+as the original ILIKE search (the ngram FULLTEXT path drops stopword ngrams).
+Run with: python -m pytest test_course_search.py
+"""
+
+import pytest
+
+for module in ('flask', 'flask_sqlalchemy', 'flask_jwt_extended', 'flask_mail', 'jwt', 'qrcode', 'PIL'):
+    pytest.importorskip(module)
+
+from flask import Flask
+from sqlalchemy import or_
+from sqlalchemy.dialects import mysql
+
+from models import db, Course
+from courses import COURSE_SEARCH_COLUMNS, _search_filter
+
+COURSES = [
+    ('Mathematics', 'Algebra and geometry for middle school'),
+    ('Physique', 'Physique et chimie - 3ème année'),
+    ('English', 'A is for apple: reading and writing'),
+    ('Arts', 'Drawing at the weekend'),
+    ('الرياضيات', 'دروس الرياضيات للسنة الأولى'),
+]
+
+LATIN_QUERIES = ['math', 'a', 'at', 'Physique et', 'année', 'is for', 'drawing at', 'I']
+
+
+def original_search_filter(search_query):
+    """The ?search= filter as it was before FULLTEXT search"""
+    search_filter = f"%{search_query}%"
+    return or_(*[column.ilike(search_filter) for column in COURSE_SEARCH_COLUMNS])
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        Course.__table__.create(db.engine)
+        for name, description in COURSES:
+            db.session.add(Course(name=name, description=description, price=1000, max_students=20))
+        db.session.commit()
+        yield app
+
+
+def course_ids(search_filter):
+    return sorted(course.id for course in Course.query.filter(search_filter))
+
+
+@pytest.mark.parametrize('search_query', LATIN_QUERIES)
+def test_latin_search_matches_original(app, search_query):
+    assert course_ids(_search_filter(search_query)) == course_ids(original_search_filter(search_query))
+
+
+@pytest.mark.parametrize('search_query', LATIN_QUERIES)
+def test_latin_search_skips_fulltext(app, search_query):
+    sql = str(_search_filter(search_query).compile(dialect=mysql.dialect()))
+    assert 'MATCH' not in sql
+
+
+def test_arabic_search_uses_fulltext(app):
+    sql = str(_search_filter('الرياضيات').compile(dialect=mysql.dialect()))
+    assert 'MATCH' in sql
@@ -1,7 +1,10 @@
 import os
+import json
 import secrets
-from datetime import datetime, timedelta
-from flask import current_app
+from datetime import date, datetime, time, timedelta
+from functools import wraps
+from flask import current_app, jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity
 from flask_mail import Message
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
@@ -9,6 +12,12 @@ import qrcode
 from PIL import Image
 import io
 import base64
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Remove the circular import - we'll import mail lazily in functions
 
@@ -52,6 +61,44 @@ def send_email(to, subject, html_body, text_body=None):
         # Fallback if import fails
         print(f"Failed to send email to {to}: Mail service not available")
 
+def _json_default(value):
+    """Fallback serializer for Decimal (and dates/times when orjson is not installed)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def json_bytes(payload):
+    """Serialize to compact UTF-8 JSON bytes (orjson when installed); usable outside a request"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+def json_response(payload, status=200):
+    """Serialize a response body with orjson when installed, else Flask's JSON provider"""
+    if orjson is not None:
+        body = orjson.dumps(payload, default=_json_default)
+    else:
+        body = current_app.json.dumps(payload)
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+def admin_required(view):
+    """Restrict a view to admins using the role claim; apply below @jwt_required()"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        claims = get_jwt()
+        role = claims.get('role')
+        if role is None and 'user_type' not in claims:
+            # Web tokens issued before the role claim existed
+            from models import User
+            user = User.query.get(int(get_jwt_identity()))
+            role = user.role if user else None
+        if role != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
 def generate_qr_code(data, size=200):
     """Generate QR code and return as base64 string"""
     qr = qrcode.QRCode(version=1, box_size=10, border=5)